@@ -1,6 +1,7 @@
 import os
 import json
 import random
+import logging
 import requests
 from typing import Dict, Any
 
@@ -8,6 +9,8 @@ from typing import Dict, Any
 HUGGINGFACE_API_KEY = os.getenv("HUGGINGFACE_API_KEY")
 HF_API_URL = "https://api-inference.huggingface.co/models/mistralai/Mistral-7B-Instruct-v0.2"
 
+logger = logging.getLogger("trustflow.ai")
+
 def calculate_trust_score(title: str, description: str, seller_reputation: float, price: float) -> Dict[str, Any]:
     """
     Intenta usar Hugging Face para análisis. Si falla o no hay key, usa un sistema experto heurístico.
@@ -16,10 +19,10 @@ def calculate_trust_score(title: str, description: str, seller_reputation: float
         try:
             return _call_huggingface_ai(title, description, seller_reputation, price)
         except Exception as e:
-            print(f"⚠️ Error con Hugging Face: {e}. Usando sistema heurístico de respaldo.")
+            logger.warning("Error con Hugging Face: %s. Usando sistema heurístico de respaldo.", e)
             return _heuristic_analysis(title, description, seller_reputation, price)
     else:
-        print("ℹ️ No HUGGINGFACE_API_KEY found. Usando sistema heurístico (Modo Offline).")
+        logger.debug("No HUGGINGFACE_API_KEY found. Usando sistema heurístico (Modo Offline).")
         return _heuristic_analysis(title, description, seller_reputation, price)
 
 def _call_huggingface_ai(title: str, description: str, seller_reputation: float, price: float) -> Dict[str, Any]:
@@ -0,0 +1,310 @@
+import gzip
+import json
+import logging
+import os
+import re
+from datetime import datetime, timezone
+from typing import Any, Dict, List, Optional
+from sqlalchemy import Column, DateTime, Index, Integer, MetaData, String, Table, func, insert, inspect, select, text, update
+from sqlalchemy.orm import Session
+import models
+
+logger = logging.getLogger("trustflow.audit")
+
+# --- Configuración ---
+AUDIT_PARTITIONS_AHEAD = int(os.getenv("AUDIT_PARTITIONS_AHEAD", "2")) # meses creados por adelantado
+AUDIT_RETENTION_MONTHS = int(os.getenv("AUDIT_RETENTION_MONTHS", "12"))
+# Si está definido, las particiones vencidas se archivan como .jsonl.gz antes de borrarlas
+AUDIT_ARCHIVE_DIR = os.getenv("AUDIT_ARCHIVE_DIR")
+
+PARENT_TABLE = "audit_logs"
+DEFAULT_PARTITION = f"{PARENT_TABLE}_default"
+LEGACY_TABLE = f"{PARENT_TABLE}_legacy"
+# Clave del advisory lock de Postgres que serializa migración, particiones y retención
+MAINTENANCE_LOCK_KEY = 0x617564697400 # "audit\0"
+_PARTITION_RE = re.compile(r"^audit_logs_(\d{4})_(\d{2})$")
+
+# Tablas mensuales de SQLite (rolling tables), definidas fuera de Base
+_sqlite_metadata = MetaData()
+_sqlite_ready = set()
+
+# Cada tabla mensual de SQLite tiene su propio autoincremento: los ids se
+# reservan en un contador común para que sigan siendo únicos entre meses
+_sqlite_id_counter = Table(
+    f"{PARENT_TABLE}_id_counter", _sqlite_metadata,
+    Column("id", Integer, primary_key=True),
+    Column("last_id", Integer, nullable=False),
+)
+
+def _month_start(value: datetime) -> datetime:
+    return datetime(value.year, value.month, 1)
+
+def _add_months(value: datetime, months: int) -> datetime:
+    index = value.year * 12 + (value.month - 1) + months
+    return datetime(index // 12, index % 12 + 1, 1)
+
+def partition_name(value: datetime) -> str:
+    return f"{PARENT_TABLE}_{value.year:04d}_{value.month:02d}"
+
+def _partition_month(name: str) -> Optional[datetime]:
+    match = _PARTITION_RE.match(name)
+    if not match:
+        return None
+    return datetime(int(match.group(1)), int(match.group(2)), 1)
+
+def _is_postgres(bind) -> bool:
+    return bind.dialect.name == "postgresql"
+
+def _sqlite_table(name: str) -> Table:
+    table = _sqlite_metadata.tables.get(name)
+    if table is None:
+        table = Table(
+            name, _sqlite_metadata,
+            Column("id", Integer, primary_key=True),
+            Column("user_id", Integer),
+            Column("action", String),
+            Column("ip_address", String),
+            Column("timestamp", DateTime),
+            Index(f"ix_{name}_user_id_timestamp", "user_id", "timestamp"),
+        )
+    return table
+
+def _maintenance_lock(conn):
+    """En Postgres serializa el DDL de particiones entre workers (se libera con la transacción)."""
+    if _is_postgres(conn):
+        conn.execute(text("SELECT pg_advisory_xact_lock(:key)"), {"key": MAINTENANCE_LOCK_KEY})
+
+def _create_partition(bind, month: datetime):
+    name = partition_name(month)
+    if _is_postgres(bind):
+        if bind.execute(text("SELECT to_regclass(:name)"), {"name": name}).scalar() is not None:
+            return
+        start = month.strftime("%Y-%m-%d")
+        end = _add_months(month, 1).strftime("%Y-%m-%d")
+        bounds = {"start": month, "end": _add_months(month, 1)}
+        in_default = False
+        if bind.execute(text("SELECT to_regclass(:name)"), {"name": DEFAULT_PARTITION}).scalar() is not None:
+            in_default = bind.execute(text(
+                f'SELECT EXISTS (SELECT 1 FROM {DEFAULT_PARTITION} WHERE "timestamp" >= :start AND "timestamp" < :end)'
+            ), bounds).scalar()
+        if in_default:
+            # Filas del mes que cayeron en DEFAULT (p.ej. el mes no se creó a tiempo):
+            # Postgres no deja crear la partición mientras estén ahí. Se desacopla
+            # DEFAULT, se crea el mes, se mueven sus filas y se vuelve a acoplar.
+            logger.warning("Moviendo filas de %s a la nueva partición %s", DEFAULT_PARTITION, name)
+            bind.execute(text(f"ALTER TABLE {PARENT_TABLE} DETACH PARTITION {DEFAULT_PARTITION}"))
+        bind.execute(text(
+            f"CREATE TABLE {name} PARTITION OF {PARENT_TABLE} "
+            f"FOR VALUES FROM ('{start}') TO ('{end}')"
+        ))
+        if in_default:
+            bind.execute(text(
+                f'WITH moved AS (DELETE FROM {DEFAULT_PARTITION} WHERE "timestamp" >= :start AND "timestamp" < :end '
+                f'RETURNING id, user_id, action, ip_address, "timestamp") '
+                f'INSERT INTO {name} (id, user_id, action, ip_address, "timestamp") SELECT * FROM moved'
+            ), bounds)
+            bind.execute(text(f"ALTER TABLE {PARENT_TABLE} ATTACH PARTITION {DEFAULT_PARTITION} DEFAULT"))
+    else:
+        _sqlite_table(name).create(bind, checkfirst=True)
+        _sqlite_ready.add((str(bind.engine.url), name))
+
+def _ensure_sqlite_id_counter(bind):
+    """Crea el contador de ids partiendo del mayor id ya usado en el padre y las tablas mensuales."""
+    key = (str(bind.engine.url), _sqlite_id_counter.name)
+    if key in _sqlite_ready:
+        return
+    _sqlite_id_counter.create(bind, checkfirst=True)
+    if bind.execute(select(_sqlite_id_counter.c.id)).first() is None:
+        tables = [models.AuditLog.__table__] + [_sqlite_table(n) for n in list_partitions(bind)]
+        last_id = max(bind.execute(select(func.max(t.c.id))).scalar() or 0 for t in tables)
+        bind.execute(insert(_sqlite_id_counter).values(id=1, last_id=last_id))
+    _sqlite_ready.add(key)
+
+def _reserve_sqlite_ids(bind, count: int) -> int:
+    """Reserva `count` ids consecutivos y devuelve el primero. El UPDATE toma el lock de escritura de SQLite."""
+    _ensure_sqlite_id_counter(bind)
+    bind.execute(update(_sqlite_id_counter).values(last_id=_sqlite_id_counter.c.last_id + count))
+    return bind.execute(select(_sqlite_id_counter.c.last_id)).scalar() - count + 1
+
+def migrate_legacy_table(engine) -> bool:
+    """
+    Convierte en Postgres un `audit_logs` sin particionar (despliegues previos)
+    en la tabla particionada: renombra la original, crea el padre, la partición
+    DEFAULT y una partición por cada mes con datos, copia las filas conservando
+    sus ids y ajusta la secuencia. Todo en una transacción. Devuelve True si migró.
+    """
+    if engine.dialect.name != "postgresql":
+        return False
+    with engine.begin() as conn:
+        _maintenance_lock(conn)
+        relkind = conn.execute(text(
+            "SELECT relkind FROM pg_class WHERE oid = to_regclass(:name)"
+        ), {"name": PARENT_TABLE}).scalar()
+        if relkind != "r":
+            return False
+
+        logger.warning("Migrando %s a tabla particionada por mes", PARENT_TABLE)
+        conn.execute(text(f"LOCK TABLE {PARENT_TABLE} IN ACCESS EXCLUSIVE MODE"))
+        conn.execute(text(f"ALTER TABLE {PARENT_TABLE} RENAME TO {LEGACY_TABLE}"))
+        # Liberar los nombres que el padre particionado vuelve a usar
+        conn.execute(text(f"ALTER INDEX IF EXISTS {PARENT_TABLE}_pkey RENAME TO {LEGACY_TABLE}_pkey"))
+        conn.execute(text(f"ALTER INDEX IF EXISTS ix_{PARENT_TABLE}_id RENAME TO ix_{LEGACY_TABLE}_id"))
+        conn.execute(text(f"ALTER INDEX IF EXISTS ix_{PARENT_TABLE}_user_id_timestamp RENAME TO ix_{LEGACY_TABLE}_user_id_timestamp"))
+        conn.execute(text(f"ALTER SEQUENCE IF EXISTS {PARENT_TABLE}_id_seq RENAME TO {LEGACY_TABLE}_id_seq"))
+
+        models.AuditLog.__table__.create(conn)
+        conn.execute(text(f"CREATE TABLE {DEFAULT_PARTITION} PARTITION OF {PARENT_TABLE} DEFAULT"))
+        # Sin timestamp se toma la fecha de la migración (la nueva columna es NOT NULL)
+        months = conn.execute(text(
+            f'SELECT DISTINCT date_trunc(\'month\', COALESCE("timestamp", now()::timestamp)) FROM {LEGACY_TABLE}'
+        )).scalars().all()
+        for month in months:
+            _create_partition(conn, _month_start(month))
+        conn.execute(text(
+            f'INSERT INTO {PARENT_TABLE} (id, user_id, action, ip_address, "timestamp") '
+            f'SELECT id, user_id, action, ip_address, COALESCE("timestamp", now()::timestamp) FROM {LEGACY_TABLE}'
+        ))
+        conn.execute(text(
+            f"SELECT setval(pg_get_serial_sequence('{PARENT_TABLE}', 'id'), COALESCE(MAX(id), 0) + 1, false) "
+            f"FROM {PARENT_TABLE}"
+        ))
+        conn.execute(text(f"DROP TABLE {LEGACY_TABLE}"))
+    return True
+
+def ensure_partitions(engine, now: Optional[datetime] = None, months_ahead: int = AUDIT_PARTITIONS_AHEAD):
+    """Crea (si faltan) las particiones del mes actual y de los próximos `months_ahead` meses."""
+    migrate_legacy_table(engine)
+    current = _month_start(now or datetime.utcnow())
+    with engine.begin() as conn:
+        _maintenance_lock(conn)
+        if _is_postgres(conn):
+            # Red de seguridad: filas fuera de rango no fallan, caen en DEFAULT
+            conn.execute(text(f"CREATE TABLE IF NOT EXISTS {DEFAULT_PARTITION} PARTITION OF {PARENT_TABLE} DEFAULT"))
+        else:
+            _ensure_sqlite_id_counter(conn)
+        for offset in range(months_ahead + 1):
+            _create_partition(conn, _add_months(current, offset))
+
+def list_partitions(bind) -> List[str]:
+    """Particiones mensuales existentes, de la más antigua a la más reciente."""
+    if _is_postgres(bind):
+        rows = bind.execute(text(
+            "SELECT c.relname FROM pg_inherits i "
+            "JOIN pg_class c ON c.oid = i.inhrelid "
+            "JOIN pg_class p ON p.oid = i.inhparent "
+            "WHERE p.relname = :parent"
+        ), {"parent": PARENT_TABLE}).scalars().all()
+    else:
+        rows = inspect(bind).get_table_names()
+    return sorted(name for name in rows if _PARTITION_RE.match(name))
+
+def write_audit(db: Session, rows: List[Dict[str, Any]]):
+    """
+    Inserta filas de auditoría en bloque. No hace commit.
+    En Postgres el padre enruta a la partición; en SQLite se agrupan por mes.
+    """
+    if not rows:
+        return
+    for row in rows:
+        row.setdefault("timestamp", datetime.utcnow())
+    bind = db.get_bind()
+    if _is_postgres(bind):
+        db.execute(insert(models.AuditLog), rows)
+        return
+
+    next_id = _reserve_sqlite_ids(db.connection(), len(rows))
+    by_table: Dict[str, List[Dict[str, Any]]] = {}
+    for offset, row in enumerate(rows):
+        row["id"] = next_id + offset
+        by_table.setdefault(partition_name(row["timestamp"]), []).append(row)
+    for name, table_rows in by_table.items():
+        if (str(bind.url), name) not in _sqlite_ready:
+            _create_partition(db.connection(), _month_start(table_rows[0]["timestamp"]))
+        db.execute(insert(_sqlite_table(name)), table_rows)
+
+def get_user_audit_logs(db: Session, user_id: int, limit: int = 50, before: Optional[datetime] = None) -> List[Dict[str, Any]]:
+    """
+    Historial de un usuario, del más reciente al más antiguo, paginado por
+    `before`. Usa el índice (user_id, timestamp) de cada partición.
+    Los timestamps se guardan en UTC naive: un `before` con zona se convierte.
+    """
+    if before is not None and before.tzinfo is not None:
+        before = before.astimezone(timezone.utc).replace(tzinfo=None)
+    before = before or datetime.max
+    bind = db.get_bind()
+    if _is_postgres(bind):
+        tables = [models.AuditLog.__table__]
+    else:
+        names = [n for n in reversed(list_partitions(db.connection())) if _partition_month(n) <= before]
+        # La tabla padre conserva los registros anteriores al particionado
+        tables = [_sqlite_table(n) for n in names] + [models.AuditLog.__table__]
+
+    results: List[Dict[str, Any]] = []
+    for table in tables:
+        remaining = limit - len(results)
+        if remaining <= 0:
+            break
+        rows = db.execute(
+            select(table.c.id, table.c.user_id, table.c.action, table.c.ip_address, table.c.timestamp)
+            .where(table.c.user_id == user_id, table.c.timestamp < before)
+            .order_by(table.c.timestamp.desc())
+            .limit(remaining)
+        ).mappings().all()
+        results.extend(dict(row) for row in rows)
+    return results
+
+def _archive_partition(conn, name: str, archive_dir: str, before: Optional[datetime] = None,
+                       archive_name: Optional[str] = None) -> str:
+    os.makedirs(archive_dir, exist_ok=True)
+    path = os.path.join(archive_dir, f"{archive_name or name}.jsonl.gz")
+    # `name` viene de list_partitions (ya pasó por _PARTITION_RE) o es una tabla fija de este módulo
+    where = ' WHERE "timestamp" < :before' if before else ""
+    result = conn.execute(
+        text(f'SELECT id, user_id, action, ip_address, "timestamp" FROM {name}{where} ORDER BY "timestamp"'),
+        {"before": before} if before else {}
+    )
+    with gzip.open(path, "wt", encoding="utf-8") as f:
+        for row in result.mappings():
+            record = dict(row)
+            if isinstance(record["timestamp"], datetime):
+                record["timestamp"] = record["timestamp"].isoformat()
+            f.write(json.dumps(record) + "\n")
+    return path
+
+def apply_retention(engine, retention_months: int = AUDIT_RETENTION_MONTHS,
+                    archive_dir: Optional[str] = AUDIT_ARCHIVE_DIR, now: Optional[datetime] = None) -> List[str]:
+    """
+    Elimina las particiones cuyo mes completo es anterior a la ventana de
+    retención, archivándolas antes en `archive_dir` si está configurado.
+    Las filas vencidas que no viven en una partición mensual (la DEFAULT de
+    Postgres, el padre con los registros previos al particionado en SQLite)
+    se archivan y borran con DELETE. Devuelve las tablas eliminadas o podadas.
+    """
+    cutoff = _add_months(_month_start(now or datetime.utcnow()), -retention_months)
+    dropped = []
+    with engine.begin() as conn:
+        _maintenance_lock(conn)
+        for name in list_partitions(conn):
+            if _partition_month(name) >= cutoff:
+                continue
+            if archive_dir:
+                path = _archive_partition(conn, name, archive_dir)
+                logger.info("Partición %s archivada en %s", name, path)
+            if _is_postgres(conn):
+                conn.execute(text(f"ALTER TABLE {PARENT_TABLE} DETACH PARTITION {name}"))
+            conn.execute(text(f"DROP TABLE {name}"))
+            _sqlite_ready.discard((str(conn.engine.url), name))
+            dropped.append(name)
+
+        legacy = DEFAULT_PARTITION if _is_postgres(conn) else PARENT_TABLE
+        expired = conn.execute(
+            text(f'SELECT COUNT(*) FROM {legacy} WHERE "timestamp" < :before'), {"before": cutoff}
+        ).scalar()
+        if expired:
+            if archive_dir:
+                path = _archive_partition(conn, legacy, archive_dir, before=cutoff,
+                                          archive_name=f"{legacy}_before_{cutoff:%Y_%m}")
+                logger.info("%d filas vencidas de %s archivadas en %s", expired, legacy, path)
+            conn.execute(text(f'DELETE FROM {legacy} WHERE "timestamp" < :before'), {"before": cutoff})
+            dropped.append(legacy)
+    return dropped
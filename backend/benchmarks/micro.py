@@ -0,0 +1,23 @@
+"""Micro-benchmarks de las funciones de scoring que corren en cada request."""
+import timeit
+from typing import Dict
+import ai_utils
+
+CASES = {
+    "heuristic_analysis_clean": lambda: ai_utils._heuristic_analysis(
+        "MacBook Pro M2 2023", "Poco uso, caja original y factura incluida. Envío asegurado.", 85.0, 1200.0
+    ),
+    "heuristic_analysis_suspicious": lambda: ai_utils._heuristic_analysis(
+        "Rolex replica", "Urgente, solo transferencia o western union, sin factura", 30.0, 45.0
+    ),
+    "detect_fraud_probability": lambda: ai_utils.detect_fraud_probability(12000.0, "127.0.0.1"),
+}
+
+def run_micro(number: int = 20000, repeat: int = 5) -> Dict[str, Dict[str, float]]:
+    """Mejor de `repeat` corridas de `number` llamadas; devuelve µs/op y ops/s."""
+    results = {}
+    for name, fn in CASES.items():
+        best = min(timeit.repeat(fn, number=number, repeat=repeat))
+        us_per_op = best / number * 1e6
+        results[name] = {"us_per_op": round(us_per_op, 3), "ops_per_sec": round(1e6 / us_per_op, 1)}
+    return results
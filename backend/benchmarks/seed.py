@@ -0,0 +1,141 @@
+"""Carga de datos sintéticos con volúmenes realistas para los benchmarks."""
+import random
+from datetime import datetime, timedelta
+from typing import Any, Dict, List
+from sqlalchemy import insert, select
+import models
+import auth
+import audit
+import stats
+from database import SessionLocal, engine
+
+BENCH_PASSWORD = "bench-password"
+CHUNK_SIZE = 1000
+
+TITLES = [
+    "MacBook Pro M2", "iPhone 14 Pro", "Sony A7IV", "Rolex Submariner", "Bicicleta de ruta",
+    "Silla ergonómica", "Monitor 4K 27\"", "Consola PS5", "Guitarra Fender", "Drone DJI Mini",
+]
+DESCRIPTIONS = [
+    "Poco uso, caja original y factura incluida. Envío asegurado.",
+    "Excelente estado, revisado por técnico certificado, con garantía.",
+    "Usado, funciona perfecto, pequeños detalles estéticos en la carcasa.",
+    "Venta urgente, solo transferencia, sin factura.",
+    "Replica de alta calidad",
+]
+ORDER_STATUSES = ["pending"] * 4 + ["delivered"] * 4 + ["completed"] * 3 + ["disputed", "manual_review"]
+
+def _chunks(rows: List[Dict[str, Any]]):
+    for start in range(0, len(rows), CHUNK_SIZE):
+        yield rows[start:start + CHUNK_SIZE]
+
+def _bulk_insert(db, model, rows: List[Dict[str, Any]]):
+    for chunk in _chunks(rows):
+        db.execute(insert(model), chunk)
+
+def seed(users: int, products: int, orders: int, reviews: int, seed_value: int = 42) -> Dict[str, List[Any]]:
+    """
+    Inserta usuarios, productos, órdenes y reseñas en bloque y reconstruye los
+    agregados de vendedores. Devuelve los ids necesarios para generar carga.
+    """
+    rng = random.Random(seed_value)
+    now = datetime.utcnow()
+    # bcrypt es deliberadamente lento: un solo hash compartido por todos los usuarios sembrados
+    hashed_password = auth.get_password_hash(BENCH_PASSWORD)
+
+    sellers = max(1, users // 5)
+    carriers = max(1, users // 20)
+    roles = ["seller"] * sellers + ["carrier"] * carriers + ["buyer"] * max(1, users - sellers - carriers)
+
+    db = SessionLocal()
+    try:
+        _bulk_insert(db, models.User, [
+            {
+                "email": f"seed-{i}-{role}@bench.trustflow.dev",
+                "hashed_password": hashed_password,
+                "role": role,
+                "kyc_status": rng.choice(["pending", "verified", "verified"]),
+                "reputation_score": round(rng.uniform(20, 100), 1),
+                "tier": rng.choice(["Bronze", "Bronze", "Silver", "Gold", "Platinum"]),
+                "created_at": now - timedelta(days=rng.randint(0, 365)),
+            }
+            for i, role in enumerate(roles)
+        ])
+        db.commit()
+
+        ids_by_role: Dict[str, List[int]] = {"seller": [], "carrier": [], "buyer": []}
+        seller_emails = []
+        for user_id, email, role in db.execute(
+            select(models.User.id, models.User.email, models.User.role).where(models.User.email.like("seed-%"))
+        ):
+            ids_by_role[role].append(user_id)
+            if role == "seller":
+                seller_emails.append(email)
+
+        _bulk_insert(db, models.Product, [
+            {
+                "seller_id": rng.choice(ids_by_role["seller"]),
+                "title": f"{rng.choice(TITLES)} #{i}",
+                "description": rng.choice(DESCRIPTIONS),
+                "price": round(rng.lognormvariate(5.5, 1.2), 2),
+                "category": "General",
+                "trust_score": round(rng.uniform(10, 100), 1),
+                "status": "active",
+                "images": "[]",
+            }
+            for i in range(products)
+        ])
+        db.commit()
+        product_rows = db.execute(select(models.Product.id, models.Product.seller_id, models.Product.price)).all()
+        product_ids = [row.id for row in product_rows]
+
+        order_rows = []
+        for _ in range(orders):
+            product = rng.choice(product_rows)
+            status = rng.choice(ORDER_STATUSES)
+            created_at = now - timedelta(days=rng.randint(0, 90), seconds=rng.randint(0, 86400))
+            fee = product.price * 0.05
+            order_rows.append({
+                "buyer_id": rng.choice(ids_by_role["buyer"]),
+                "product_id": product.id,
+                "seller_id": product.seller_id,
+                "carrier_id": rng.choice(ids_by_role["carrier"]),
+                "total_amount": product.price,
+                "platform_fee": fee,
+                "net_amount": product.price - fee,
+                "escrow_status": "released_to_seller" if status in ("delivered", "completed") else "held",
+                "order_status": status,
+                "created_at": created_at,
+                "completed_at": created_at + timedelta(days=rng.randint(1, 10)) if status in ("delivered", "completed") else None,
+            })
+        _bulk_insert(db, models.Order, order_rows)
+        db.commit()
+
+        delivered = db.execute(
+            select(models.Order.id, models.Order.buyer_id, models.Order.seller_id)
+            .where(models.Order.order_status.in_(("delivered", "completed")))
+        ).all()
+        _bulk_insert(db, models.Review, [
+            {
+                "order_id": order.id,
+                "reviewer_id": order.buyer_id,
+                "reviewee_id": order.seller_id,
+                "rating": rng.randint(1, 5),
+                "comment": "Reseña generada para benchmark",
+            }
+            for order in rng.sample(delivered, min(reviews, len(delivered)))
+        ])
+        db.commit()
+
+        stats.reconcile_seller_stats(db)
+    finally:
+        db.close()
+
+    audit.ensure_partitions(engine)
+    return {
+        "seller_ids": ids_by_role["seller"],
+        "seller_emails": seller_emails,
+        "carrier_ids": ids_by_role["carrier"],
+        "buyer_ids": ids_by_role["buyer"],
+        "product_ids": product_ids,
+    }
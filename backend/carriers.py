@@ -0,0 +1,178 @@
+import bisect
+import os
+import threading
+import time
+from typing import Any, Dict, List, Optional
+from sqlalchemy.orm import Session
+import models
+from database import SessionLocal
+
+# Estados en los que una orden ocupa al transportista
+ACTIVE_ORDER_STATUSES = ("pending", "manual_review", "shipped")
+
+CARRIER_MAX_ACTIVE_ORDERS = int(os.getenv("CARRIER_MAX_ACTIVE_ORDERS", "20"))
+# Cada worker tiene su propio índice; se reconstruye desde la base cada TTL
+# para absorber las escrituras hechas por otros procesos.
+CARRIER_INDEX_TTL_SECONDS = float(os.getenv("CARRIER_INDEX_TTL_SECONDS", "60"))
+
+class CarrierIndex:
+    """
+    Índice en memoria de transportistas ordenado por (carga activa asc,
+    reputación desc, id). Mantiene una lista ordenada con bisect, así que el
+    top-N y la paginación son un slice y cada actualización es O(log n + n)
+    sobre una lista de tuplas.
+
+    La carga se deriva del conjunto de órdenes activas (orden -> transportista),
+    no de sumas y restas: marcar una orden dos veces no la cuenta dos veces.
+    Así la reconstrucción lee la base sin el lock y, al reemplazar, vuelve a
+    aplicar los cambios recibidos mientras leía; los que la lectura ya vio
+    quedan igual. El lock solo cubre trabajo en memoria, nunca un commit.
+    """
+    def __init__(self, max_active_orders: int = CARRIER_MAX_ACTIVE_ORDERS, ttl_seconds: float = CARRIER_INDEX_TTL_SECONDS):
+        self.max_active_orders = max_active_orders
+        self.ttl_seconds = ttl_seconds
+        self._lock = threading.RLock()
+        self._rebuild_lock = threading.Lock()
+        self._carriers: Dict[int, Dict[str, Any]] = {}
+        self._active_orders: Dict[int, int] = {}
+        self._ranking: List[tuple] = []
+        self._built_at: Optional[float] = None
+        # Cambios recibidos durante una reconstrucción en curso (None si no hay ninguna)
+        self._pending: Optional[List[tuple]] = None
+
+    @staticmethod
+    def _rank_key(carrier: Dict[str, Any]) -> tuple:
+        return (carrier["active_orders"], -(carrier["reputation_score"] or 0.0), carrier["id"])
+
+    def _is_stale(self) -> bool:
+        return self._built_at is None or time.monotonic() - self._built_at > self.ttl_seconds
+
+    def rebuild(self, db: Session):
+        """
+        Carga transportistas y sus órdenes activas (dos consultas, sin el lock) y
+        reemplaza el índice aplicando encima los cambios llegados durante la lectura.
+        """
+        with self._lock:
+            self._pending = []
+        try:
+            users = db.query(models.User).filter(models.User.role == "carrier").all()
+            active_orders = dict(
+                db.query(models.Order.id, models.Order.carrier_id)
+                .filter(models.Order.order_status.in_(ACTIVE_ORDER_STATUSES),
+                        models.Order.carrier_id.isnot(None)).all()
+            )
+            carriers = {user.id: self._from_user(user) for user in users}
+            for carrier_id in active_orders.values():
+                if carrier_id in carriers:
+                    carriers[carrier_id]["active_orders"] += 1
+            with self._lock:
+                self._carriers = carriers
+                self._active_orders = active_orders
+                self._ranking = sorted(self._rank_key(c) for c in carriers.values())
+                for change in self._pending:
+                    self._apply(change)
+                self._built_at = time.monotonic()
+        finally:
+            with self._lock:
+                self._pending = None
+
+    def ensure_fresh(self):
+        """
+        Reconstruye si venció el TTL. Un solo hilo reconstruye; mientras tanto
+        el resto sigue sirviendo el índice anterior (solo esperan si aún no hay ninguno).
+        """
+        if not self._is_stale():
+            return
+        if not self._rebuild_lock.acquire(blocking=self._built_at is None):
+            return
+        try:
+            if not self._is_stale():
+                return
+            # Siempre contra el primario: una réplica atrasada perdería órdenes recién creadas
+            db = SessionLocal()
+            try:
+                self.rebuild(db)
+            finally:
+                db.close()
+        finally:
+            self._rebuild_lock.release()
+
+    @staticmethod
+    def _from_user(user: models.User) -> Dict[str, Any]:
+        return {
+            "id": user.id,
+            "email": user.email,
+            "role": user.role,
+            "kyc_status": user.kyc_status,
+            "reputation_score": user.reputation_score,
+            "tier": user.tier,
+            "active_orders": 0,
+        }
+
+    def _reindex(self, carrier_id: int, **changes):
+        carrier = self._carriers.get(carrier_id)
+        if carrier is None:
+            return
+        old_key = self._rank_key(carrier)
+        carrier.update(changes)
+        position = bisect.bisect_left(self._ranking, old_key)
+        if position < len(self._ranking) and self._ranking[position] == old_key:
+            del self._ranking[position]
+        bisect.insort(self._ranking, self._rank_key(carrier))
+
+    def _record(self, change: tuple):
+        """Aplica un cambio al índice actual y lo encola si hay una reconstrucción leyendo la base."""
+        with self._lock:
+            if self._built_at is None and self._pending is None:
+                return # Se cargará completo en la primera consulta
+            self._apply(change)
+            if self._pending is not None:
+                self._pending.append(change)
+
+    def _apply(self, change: tuple):
+        kind, *args = change
+        if kind == "order":
+            order_id, carrier_id, active = args
+            previous = self._active_orders.pop(order_id, None)
+            if active:
+                self._active_orders[order_id] = carrier_id
+            for affected, delta in ((previous, -1), (carrier_id if active else None, 1)):
+                if affected is not None and affected in self._carriers:
+                    self._reindex(affected, active_orders=self._carriers[affected]["active_orders"] + delta)
+            return
+
+        profile = args[0]
+        if profile["id"] in self._carriers:
+            profile = dict(profile)
+            profile.pop("active_orders")
+            self._reindex(profile["id"], **profile)
+        elif profile["role"] == "carrier":
+            carrier = dict(profile)
+            carrier["active_orders"] = sum(1 for c in self._active_orders.values() if c == profile["id"])
+            self._carriers[carrier["id"]] = carrier
+            bisect.insort(self._ranking, self._rank_key(carrier))
+
+    def upsert_carrier(self, user: models.User):
+        """Alta o actualización de perfil (registro, upgrade, cambio de reputación)."""
+        self._record(("carrier", self._from_user(user)))
+
+    def record_order(self, order_id: int, carrier_id: Optional[int], order_status: str):
+        """
+        Estado de una orden tras su commit (create/confirm/dispute/bulk). Idempotente:
+        la orden cuenta como carga de su transportista solo en ACTIVE_ORDER_STATUSES.
+        """
+        active = carrier_id is not None and order_status in ACTIVE_ORDER_STATUSES
+        self._record(("order", order_id, carrier_id, active))
+
+    def best_available(self, limit: int = 10, offset: int = 0, available_only: bool = True) -> List[Dict[str, Any]]:
+        """Top transportistas por menor carga y mejor reputación, paginado."""
+        self.ensure_fresh()
+        with self._lock:
+            end = len(self._ranking)
+            if available_only:
+                # Todo lo que tenga carga >= máximo queda al final del ranking
+                end = bisect.bisect_left(self._ranking, (self.max_active_orders,))
+            keys = self._ranking[offset:min(end, offset + limit)]
+            return [dict(self._carriers[key[2]]) for key in keys]
+
+carrier_index = CarrierIndex()
@@ -1,22 +1,151 @@
-from sqlalchemy import create_engine
+from sqlalchemy import create_engine, event
 from sqlalchemy.ext.declarative import declarative_base
 from sqlalchemy.orm import sessionmaker
+from fastapi import Request
+from typing import List
+import itertools
+import logging
+import threading
+import time
 import os
+import auth
 
 # Default to SQLite for rapid prototyping as requested, but support Postgres via env var
 SQLALCHEMY_DATABASE_URL = os.getenv("DATABASE_URL", "sqlite:///./trustflow.db")
 
-check_same_thread = {"check_same_thread": False} if "sqlite" in SQLALCHEMY_DATABASE_URL else {}
+# Réplicas de solo lectura, separadas por comas. Vacío = todo va al primario.
+# ej. DATABASE_REPLICA_URLS="postgresql://...@replica1/trustflow,postgresql://...@replica2/trustflow"
+# En local sirven archivos SQLite o contenedores Postgres como réplicas.
+REPLICA_DATABASE_URLS = [u.strip() for u in os.getenv("DATABASE_REPLICA_URLS", "").split(",") if u.strip()]
+
+# Ventana "read-your-writes": tras escribir, las lecturas del mismo cliente van al primario
+STICKY_PRIMARY_SECONDS = float(os.getenv("DATABASE_STICKY_PRIMARY_SECONDS", "5"))
+
+def _connect_args(url: str) -> dict:
+    return {"check_same_thread": False} if "sqlite" in url else {}
 
 engine = create_engine(
-    SQLALCHEMY_DATABASE_URL, connect_args=check_same_thread
+    SQLALCHEMY_DATABASE_URL, connect_args=_connect_args(SQLALCHEMY_DATABASE_URL)
 )
 SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
 
+replica_engines = [create_engine(url, connect_args=_connect_args(url)) for url in REPLICA_DATABASE_URLS]
+ReplicaSessions = [sessionmaker(autocommit=False, autoflush=False, bind=e) for e in replica_engines]
+
 Base = declarative_base()
 
-def get_db():
+# --- Router de lectura/escritura ---
+_replica_lock = threading.Lock()
+_replica_cycle = itertools.cycle(ReplicaSessions) if ReplicaSessions else None
+
+logger = logging.getLogger("trustflow.database")
+
+# La ventana sticky se comparte entre workers vía Redis cuando REDIS_URL está
+# configurado; si no, queda en memoria del proceso (válido con un solo worker).
+_sticky_redis = None
+if os.getenv("REDIS_URL"):
+    try:
+        from redis_client import redis_conn as _sticky_redis
+    except ImportError:
+        logger.warning("REDIS_URL definido pero el paquete redis no está instalado; sticky-primary por proceso")
+
+_sticky_lock = threading.Lock()
+_sticky_until = {}
+
+def _next_replica_session():
+    """Round-robin entre réplicas."""
+    with _replica_lock:
+        return next(_replica_cycle)
+
+def user_sticky_key(email: str) -> str:
+    return f"sticky:user:{email}"
+
+def _sticky_keys(request: Request) -> List[str]:
+    """
+    Claves read-your-writes del request: el usuario (`sub` del JWT, el mismo
+    que fijan /register y /token) y la IP del cliente. La IP cubre lecturas
+    anónimas del mismo cliente, p.ej. GET /products sin token tras POST /products.
+    """
+    keys = []
+    auth_header = request.headers.get("authorization", "")
+    if auth_header.lower().startswith("bearer "):
+        try:
+            payload = auth.jwt.decode(auth_header[7:], auth.SECRET_KEY, algorithms=[auth.ALGORITHM])
+            if payload.get("sub"):
+                keys.append(user_sticky_key(payload["sub"]))
+        except auth.JWTError:
+            pass
+    keys.append(f"sticky:ip:{request.client.host if request.client else 'anonymous'}")
+    return keys
+
+def bind_session_user(db, email: str):
+    """Asocia la sesión a un usuario en rutas que aún no tienen token (registro, login)."""
+    key = user_sticky_key(email)
+    keys = db.info.setdefault("sticky_keys", [])
+    if key not in keys:
+        keys.insert(0, key)
+
+def mark_primary_sticky(key: str):
+    if _sticky_redis is not None:
+        try:
+            _sticky_redis.set(key, 1, px=int(STICKY_PRIMARY_SECONDS * 1000))
+            return
+        except Exception as e:
+            logger.warning("Redis no disponible para sticky-primary (%s); usando memoria local", e)
+    now = time.monotonic()
+    with _sticky_lock:
+        _sticky_until[key] = now + STICKY_PRIMARY_SECONDS
+        if len(_sticky_until) > 10000:
+            for k in [k for k, until in _sticky_until.items() if until <= now]:
+                del _sticky_until[k]
+
+def is_primary_sticky(*keys: str) -> bool:
+    """True si alguna de las claves escribió hace menos de STICKY_PRIMARY_SECONDS (una consulta a Redis)."""
+    if _sticky_redis is not None:
+        try:
+            return bool(_sticky_redis.exists(*keys))
+        except Exception as e:
+            logger.warning("Redis no disponible para sticky-primary (%s); usando memoria local", e)
+    now = time.monotonic()
+    with _sticky_lock:
+        return any(_sticky_until.get(key, 0) > now for key in keys)
+
+@event.listens_for(SessionLocal, "after_flush")
+def _mark_session_wrote(session, flush_context):
+    session.info["wrote"] = True
+
+@event.listens_for(SessionLocal, "do_orm_execute")
+def _mark_session_execute(orm_execute_state):
+    # Cubre session.execute(insert/update/delete(...)) y query.update(), que no pasan por flush
+    if orm_execute_state.is_insert or orm_execute_state.is_update or orm_execute_state.is_delete:
+        orm_execute_state.session.info["wrote"] = True
+
+@event.listens_for(SessionLocal, "after_commit")
+def _stick_after_write(session):
+    keys = session.info.get("sticky_keys")
+    if keys and session.info.pop("wrote", False):
+        for key in keys:
+            mark_primary_sticky(key)
+
+def get_db(request: Request):
+    """Sesión contra el primario. Usar en escrituras y rutas read-your-writes."""
     db = SessionLocal()
+    db.info["sticky_keys"] = _sticky_keys(request)
+    try:
+        yield db
+    finally:
+        db.close()
+
+def get_read_db(request: Request):
+    """
+    Sesión de solo lectura: va a una réplica (round-robin) salvo que no haya
+    réplicas configuradas o el cliente haya escrito hace menos de
+    STICKY_PRIMARY_SECONDS.
+    """
+    if _replica_cycle is None or is_primary_sticky(*_sticky_keys(request)):
+        db = SessionLocal()
+    else:
+        db = _next_replica_session()()
     try:
         yield db
     finally:
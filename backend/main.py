@@ -8,8 +8,14 @@ import models
 import schemas
 import auth
 import ai_utils
+import stats
+import profiling
+import settlement
+import audit
+import carriers
+import scheduler
 from datetime import datetime
-from database import engine, get_db
+from database import engine, replica_engines, get_db, get_read_db, bind_session_user
 
 # --- Rate Limiting Setup (Fase 6.1) ---
 from slowapi import Limiter, _rate_limit_exceeded_handler
@@ -20,8 +26,10 @@ limiter = Limiter(key_func=get_remote_address)
 
 # Create tables
 models.Base.metadata.create_all(bind=engine)
+audit.ensure_partitions(engine)
 
 app = FastAPI(title="TrustFlow Monolith API")
+app.router.route_class = profiling.ProfiledRoute # el profiler muestrea solo el hilo del endpoint
 app.state.limiter = limiter
 app.add_exception_handler(RateLimitExceeded, _rate_limit_exceeded_handler)
 
@@ -41,21 +49,35 @@ app.add_middleware(
     allow_headers=["*"],
 )
 
+# --- Observabilidad: perfiles por request y queries lentas (opt-in) ---
+app.add_middleware(profiling.RequestProfilingMiddleware)
+for _engine in [engine, *replica_engines]:
+    profiling.install_query_hooks(_engine)
+
+# --- Jobs periódicos (particiones y retención de auditoría) ---
+@app.on_event("startup")
+def start_scheduler():
+    if scheduler.SCHEDULER_ENABLED:
+        scheduler.scheduler.start()
+
+@app.on_event("shutdown")
+def stop_scheduler():
+    scheduler.scheduler.stop()
+
 oauth2_scheme = OAuth2PasswordBearer(tokenUrl="token")
 
 # --- Helper: Auditoría (Fase 6.3) ---
 def log_audit_action(db: Session, user_id: int, action: str, ip_address: str):
-    """Registra acciones sensibles en la base de datos."""
-    audit = models.AuditLog(
-        user_id=user_id,
-        action=action,
-        ip_address=ip_address,
-        timestamp=datetime.utcnow()
-    )
-    db.add(audit)
+    """Registra acciones sensibles en la base de datos (partición del mes en curso)."""
+    audit.write_audit(db, [{
+        "user_id": user_id,
+        "action": action,
+        "ip_address": ip_address,
+        "timestamp": datetime.utcnow()
+    }])
     db.commit()
 
-def get_current_user(token: str = Depends(oauth2_scheme), db: Session = Depends(get_db)):
+def _resolve_user(token: str, db: Session):
     credentials_exception = HTTPException(
         status_code=status.HTTP_401_UNAUTHORIZED,
         detail="No se pudieron validar las credenciales",
@@ -74,9 +96,17 @@ def get_current_user(token: str = Depends(oauth2_scheme), db: Session = Depends(
         raise credentials_exception
     return user
 
+def get_current_user(token: str = Depends(oauth2_scheme), db: Session = Depends(get_db)):
+    return _resolve_user(token, db)
+
+def get_current_user_read(token: str = Depends(oauth2_scheme), db: Session = Depends(get_read_db)):
+    """Igual que get_current_user pero leyendo de una réplica (solo para rutas sin escrituras)."""
+    return _resolve_user(token, db)
+
 @app.post("/register", response_model=schemas.UserOut)
 @limiter.limit("5/minute") # Rate Limiting
 def register(request: Request, user: schemas.UserCreate, db: Session = Depends(get_db)):
+    bind_session_user(db, user.email) # read-your-writes para el login y /users/me siguientes
     db_user = db.query(models.User).filter(models.User.email == user.email).first()
     if db_user:
         raise HTTPException(status_code=400, detail="El correo electrónico ya está registrado")
@@ -92,6 +122,7 @@ def register(request: Request, user: schemas.UserCreate, db: Session = Depends(g
     db.add(new_user)
     db.commit()
     db.refresh(new_user)
+    carriers.carrier_index.upsert_carrier(new_user)
     
     log_audit_action(db, new_user.id, "USER_REGISTER", request.client.host)
     
@@ -100,6 +131,7 @@ def register(request: Request, user: schemas.UserCreate, db: Session = Depends(g
 @app.post("/token", response_model=schemas.Token)
 @limiter.limit("10/minute") # Rate Limiting
 def login_for_access_token(request: Request, form_data: OAuth2PasswordRequestForm = Depends(), db: Session = Depends(get_db)):
+    bind_session_user(db, form_data.username)
     user = db.query(models.User).filter(models.User.email == form_data.username).first()
     if not user or not auth.verify_password(form_data.password, user.hashed_password):
         raise HTTPException(
@@ -117,7 +149,7 @@ def login_for_access_token(request: Request, form_data: OAuth2PasswordRequestFor
     return {"access_token": access_token, "token_type": "bearer"}
 
 @app.get("/users/me", response_model=schemas.UserOut)
-def read_users_me(current_user: models.User = Depends(get_current_user)):
+def read_users_me(current_user: models.User = Depends(get_current_user_read)):
     return current_user
 
 @app.post("/users/upgrade", response_model=schemas.UserOut)
@@ -129,16 +161,52 @@ def upgrade_subscription(request: Request, upgrade: schemas.UserUpgrade, db: Ses
     current_user.tier = upgrade.tier
     db.commit()
     db.refresh(current_user)
+    carriers.carrier_index.upsert_carrier(current_user)
     
     log_audit_action(db, current_user.id, f"USER_UPGRADE_{upgrade.tier.upper()}", request.client.host)
     return current_user
 
+@app.get("/users/{user_id}/audit-logs", response_model=List[schemas.AuditLogOut])
+def get_user_audit_logs(user_id: int, limit: int = 50, before: Optional[datetime] = None, db: Session = Depends(get_read_db), current_user: models.User = Depends(get_current_user_read)):
+    """Historial de auditoría de un usuario, paginado hacia atrás con `before`."""
+    if current_user.id != user_id and current_user.role != "admin":
+        raise HTTPException(status_code=403, detail="No autorizado para ver esta auditoría")
+    if limit < 1 or limit > 500:
+        raise HTTPException(status_code=400, detail="El límite debe estar entre 1 y 500")
+    return audit.get_user_audit_logs(db, user_id, limit, before)
+
 @app.get("/users/carriers", response_model=List[schemas.UserOut])
-def get_carriers(db: Session = Depends(get_db)):
-    return db.query(models.User).filter(models.User.role == "carrier").all()
+def get_carriers(db: Session = Depends(get_read_db)):
+    """Todos los transportistas, sin paginar (contrato de api.orders.getCarriers)."""
+    return db.query(models.User).filter(models.User.role == "carrier").order_by(models.User.id).all()
+
+@app.get("/carriers/available", response_model=List[schemas.CarrierOut])
+def get_available_carriers(skip: int = 0, limit: int = 10):
+    """Mejores N transportistas con capacidad libre: menor carga activa y mayor reputación primero."""
+    if limit < 1 or limit > 100:
+        raise HTTPException(status_code=400, detail="El límite debe estar entre 1 y 100")
+    return carriers.carrier_index.best_available(limit=limit, offset=skip)
+
+@app.get("/sellers/me/stats", response_model=schemas.SellerStatsOut)
+def get_my_seller_stats(days: int = 30, db: Session = Depends(get_read_db), current_user: models.User = Depends(get_current_user_read)):
+    """Métricas del dashboard de vendedor, leídas de las tablas de agregados."""
+    if current_user.role != "seller":
+        raise HTTPException(status_code=403, detail="Solo los vendedores tienen estadísticas de ventas")
+    if days < 1 or days > 366:
+        raise HTTPException(status_code=400, detail="El rango de días debe estar entre 1 y 366")
+    return stats.get_seller_stats(db, current_user.id, days)
+
+@app.get("/admin/profiles/{profile_id}")
+def get_request_profile(profile_id: str, current_user: models.User = Depends(get_current_user_read)):
+    if current_user.role != "admin":
+        raise HTTPException(status_code=403, detail="Solo los administradores pueden ver perfiles")
+    profile = profiling.load_profile(profile_id)
+    if profile is None:
+        raise HTTPException(status_code=404, detail="Perfil no encontrado")
+    return profile
 
 @app.post("/analyze", response_model=schemas.ProductAnalysisResponse)
-def analyze_product(request: schemas.ProductAnalysisRequest, current_user: models.User = Depends(get_current_user)):
+def analyze_product(request: schemas.ProductAnalysisRequest, current_user: models.User = Depends(get_current_user_read)):
     """Endpoint para analizar productos con IA (Llamada Real al Backend)"""
     result = ai_utils.calculate_trust_score(
         title=request.title, 
@@ -172,7 +240,7 @@ def create_product(product: schemas.ProductCreate, db: Session = Depends(get_db)
     return new_product
 
 @app.get("/products", response_model=List[schemas.ProductOut])
-def get_products(skip: int = 0, limit: int = 100, q: Optional[str] = None, db: Session = Depends(get_db)):
+def get_products(skip: int = 0, limit: int = 100, q: Optional[str] = None, db: Session = Depends(get_read_db)):
     query = db.query(models.Product).filter(models.Product.status == "active")
     if q:
         search = f"%{q}%"
@@ -212,11 +280,15 @@ def create_order(request: Request, order: schemas.OrderCreate, db: Session = Dep
         platform_fee=platform_fee,  # Guardamos la comisión
         net_amount=net_amount,      # Guardamos el neto al vendedor
         escrow_status=escrow_status,
-        order_status=order_status
+        order_status=order_status,
+        created_at=datetime.utcnow()
     )
     db.add(new_order)
+    db.flush()
+    stats.record_order_created(db, new_order)
     db.commit()
     db.refresh(new_order)
+    carriers.carrier_index.record_order(new_order.id, new_order.carrier_id, new_order.order_status)
     
     log_audit_action(db, current_user.id, f"ORDER_CREATE_STATUS_{order_status.upper()}", request.client.host)
 
@@ -231,16 +303,27 @@ def confirm_delivery(request: Request, order_id: int, db: Session = Depends(get_
     if current_user.id != order.buyer_id and current_user.id != order.carrier_id:
         raise HTTPException(status_code=403, detail="No autorizado para confirmar esta orden")
 
+    stats.record_status_change(db, order.seller_id, order.order_status, "delivered")
     order.order_status = "delivered"
     order.escrow_status = "released_to_seller"
     order.completed_at = datetime.utcnow()
     
     db.commit()
     db.refresh(order)
+    carriers.carrier_index.record_order(order.id, order.carrier_id, order.order_status)
     
     log_audit_action(db, current_user.id, "ORDER_CONFIRM_DELIVERY", request.client.host)
     return order
 
+@app.post("/orders/bulk-confirm", response_model=List[schemas.BulkConfirmResult])
+def bulk_confirm_delivery(request: Request, payload: schemas.BulkConfirmRequest, db: Session = Depends(get_db), current_user: models.User = Depends(get_current_user)):
+    """Liquidación en bloque: el transportista confirma todas las entregas de su ruta en una llamada."""
+    if not payload.order_ids:
+        raise HTTPException(status_code=400, detail="Debe indicar al menos una orden")
+    if len(payload.order_ids) > settlement.MAX_BULK_ORDERS:
+        raise HTTPException(status_code=400, detail=f"Máximo {settlement.MAX_BULK_ORDERS} órdenes por solicitud")
+    return settlement.bulk_confirm_delivery(db, current_user, payload.order_ids, request.client.host)
+
 @app.post("/orders/{order_id}/dispute", response_model=schemas.OrderOut)
 def raise_dispute(request: Request, order_id: int, db: Session = Depends(get_db), current_user: models.User = Depends(get_current_user)):
     order = db.query(models.Order).filter(models.Order.id == order_id).first()
@@ -253,11 +336,13 @@ def raise_dispute(request: Request, order_id: int, db: Session = Depends(get_db)
     if order.order_status == "completed":
         raise HTTPException(status_code=400, detail="No se puede disputar una orden completada")
 
+    stats.record_status_change(db, order.seller_id, order.order_status, "disputed")
     order.order_status = "disputed"
     order.escrow_status = "disputed" 
     
     db.commit()
     db.refresh(order)
+    carriers.carrier_index.record_order(order.id, order.carrier_id, order.order_status)
     
     log_audit_action(db, current_user.id, "ORDER_DISPUTE", request.client.host)
     return order
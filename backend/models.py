@@ -1,4 +1,4 @@
-from sqlalchemy import Column, Integer, String, Float, DateTime, Text, Boolean, ForeignKey
+from sqlalchemy import Column, Integer, String, Float, DateTime, Date, Text, Boolean, ForeignKey, Index, Identity
 from sqlalchemy.orm import relationship
 from database import Base
 import datetime
@@ -52,9 +52,45 @@ class Review(Base):
     comment = Column(Text)
 
 class AuditLog(Base):
+    """
+    En Postgres es la tabla padre particionada por mes (ver audit.py y
+    databases/init.sql). En SQLite las escrituras van a tablas mensuales
+    `audit_logs_YYYY_MM` y esta tabla solo conserva filas históricas.
+    """
     __tablename__ = "audit_logs"
-    id = Column(Integer, primary_key=True, index=True)
+    __table_args__ = (
+        Index("ix_audit_logs_user_id_timestamp", "user_id", "timestamp"),
+        {"postgresql_partition_by": "RANGE (timestamp)"},
+    )
+    # La clave de partición debe formar parte de la PK
+    id = Column(Integer, Identity(), primary_key=True)
     user_id = Column(Integer, ForeignKey("users.id"))
     action = Column(String)
     ip_address = Column(String)
-    timestamp = Column(DateTime, default=datetime.datetime.utcnow)
+    timestamp = Column(DateTime, primary_key=True, default=datetime.datetime.utcnow)
+
+class SellerStats(Base):
+    """Agregados por vendedor, mantenidos en la misma transacción que las órdenes."""
+    __tablename__ = "seller_stats"
+    seller_id = Column(Integer, ForeignKey("users.id"), primary_key=True)
+    order_count = Column(Integer, default=0)
+    gross_revenue = Column(Float, default=0.0) # SUM(orders.total_amount)
+    platform_fees = Column(Float, default=0.0) # SUM(orders.platform_fee)
+    net_revenue = Column(Float, default=0.0) # SUM(orders.net_amount)
+    updated_at = Column(DateTime, default=datetime.datetime.utcnow)
+
+class SellerStatusCount(Base):
+    __tablename__ = "seller_status_counts"
+    seller_id = Column(Integer, ForeignKey("users.id"), primary_key=True)
+    order_status = Column(String, primary_key=True)
+    order_count = Column(Integer, default=0)
+
+class SellerDailyStats(Base):
+    """Rollup diario por vendedor (bucket = fecha UTC de creación de la orden)."""
+    __tablename__ = "seller_daily_stats"
+    seller_id = Column(Integer, ForeignKey("users.id"), primary_key=True)
+    day = Column(Date, primary_key=True)
+    order_count = Column(Integer, default=0)
+    gross_revenue = Column(Float, default=0.0)
+    platform_fees = Column(Float, default=0.0)
+    net_revenue = Column(Float, default=0.0)
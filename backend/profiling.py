@@ -0,0 +1,270 @@
+import asyncio
+import contextvars
+import functools
+import inspect
+import json
+import logging
+import os
+import random
+import sys
+import threading
+import time
+import uuid
+from collections import Counter
+from contextlib import contextmanager
+import anyio
+from fastapi.routing import APIRoute
+from sqlalchemy import event
+from starlette.middleware.base import BaseHTTPMiddleware
+import auth
+
+logger = logging.getLogger("trustflow.profiling")
+sql_logger = logging.getLogger("trustflow.sql")
+
+# --- Configuración (todo opt-in) ---
+# Fracción de requests perfilados automáticamente (0 = solo con header de admin)
+PROFILE_SAMPLE_RATE = float(os.getenv("PROFILE_SAMPLE_RATE", "0"))
+PROFILE_INTERVAL_MS = float(os.getenv("PROFILE_INTERVAL_MS", "5"))
+PROFILE_DIR = os.getenv("PROFILE_DIR", "./profiles")
+PROFILE_HEADER = "x-trustflow-profile"
+SLOW_QUERY_MS = float(os.getenv("SLOW_QUERY_MS", "200"))
+N_PLUS_ONE_THRESHOLD = int(os.getenv("N_PLUS_ONE_THRESHOLD", "10"))
+
+# Contador de sentencias del request en curso (lo propaga Starlette al threadpool)
+_request_queries = contextvars.ContextVar("request_queries", default=None)
+# Hilos que están ejecutando código del request perfilado: {thread_id: code}.
+# code None = todo el hilo es del request (worker del threadpool); si no, solo
+# cuentan las pilas que pasan por ese código (el event loop es compartido).
+_request_threads = contextvars.ContextVar("request_threads", default=None)
+# Un wrapper por callable: FastAPI cachea dependencias por identidad de `call`
+_tracked_calls = {}
+
+@contextmanager
+def _tracking(code=None):
+    threads = _request_threads.get()
+    if threads is None:
+        yield
+        return
+    thread_id = threading.get_ident()
+    threads[thread_id] = code
+    try:
+        yield
+    finally:
+        threads.pop(thread_id, None)
+
+def track_thread(call):
+    """
+    Registra el hilo que ejecuta `call` (endpoint o dependencia) mientras
+    corre para el request perfilado. Las corrutinas marcan el hilo del event
+    loop limitado a su propio código; los generadores (dependencias con
+    yield, como get_db) se registran en cada paso, que FastAPI puede correr
+    en hilos distintos.
+    """
+    if call in _tracked_calls:
+        return _tracked_calls[call]
+
+    if asyncio.iscoroutinefunction(call):
+        @functools.wraps(call)
+        async def wrapper(*args, **kwargs):
+            with _tracking(call.__code__):
+                return await call(*args, **kwargs)
+    elif inspect.isgeneratorfunction(call):
+        @functools.wraps(call)
+        def wrapper(*args, **kwargs):
+            gen = call(*args, **kwargs)
+            step, arg = gen.send, None
+            while True:
+                try:
+                    with _tracking():
+                        value = step(arg)
+                except StopIteration:
+                    return
+                try:
+                    arg = yield value
+                    step = gen.send
+                except GeneratorExit:
+                    with _tracking():
+                        gen.close()
+                    raise
+                except BaseException as exc:
+                    step, arg = gen.throw, exc
+    else:
+        @functools.wraps(call)
+        def wrapper(*args, **kwargs):
+            with _tracking():
+                return call(*args, **kwargs)
+
+    _tracked_calls[call] = wrapper
+    return wrapper
+
+def _track_dependencies(dependant):
+    for sub in dependant.dependencies:
+        # Solo funciones: clases y callables como OAuth2PasswordBearer se dejan tal cual
+        if inspect.isfunction(sub.call) or inspect.ismethod(sub.call):
+            sub.call = track_thread(sub.call)
+        _track_dependencies(sub)
+
+class ProfiledRoute(APIRoute):
+    """
+    Route class que envuelve con track_thread el endpoint y sus dependencias
+    (auth, sesión de DB), para que el perfil cubra todo el request.
+    """
+    def __init__(self, path, endpoint, **kwargs):
+        super().__init__(path, track_thread(endpoint), **kwargs)
+
+    def get_route_handler(self):
+        _track_dependencies(self.dependant)
+        return super().get_route_handler()
+
+class _StackSampler:
+    """
+    Profiler estadístico: cada `interval` segundos toma la pila de los hilos
+    que están ejecutando este request (ver track_thread) y acumula pilas
+    colapsadas (formato flamegraph "a;b;c N"). Los demás requests
+    concurrentes no entran en el perfil.
+    """
+    def __init__(self, interval: float, threads: dict):
+        self.interval = interval
+        self.threads = threads
+        self.samples = 0
+        self.stacks = Counter()
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._run, daemon=True)
+
+    def start(self):
+        self._thread.start()
+
+    def stop(self):
+        self._stop.set()
+        self._thread.join()
+
+    def _run(self):
+        while not self._stop.wait(self.interval):
+            self.samples += 1
+            frames = sys._current_frames()
+            for thread_id, owner in list(self.threads.items()):
+                frame = frames.get(thread_id)
+                if frame is None:
+                    continue
+                stack = []
+                owned = owner is None
+                while frame is not None:
+                    code = frame.f_code
+                    owned = owned or code is owner
+                    stack.append(f"{code.co_name} ({os.path.basename(code.co_filename)}:{code.co_firstlineno})")
+                    frame = frame.f_back
+                # En el event loop, solo si la corrutina del request está corriendo ahora
+                if owned:
+                    self.stacks[";".join(reversed(stack))] += 1
+
+def _is_admin(request) -> bool:
+    auth_header = request.headers.get("authorization", "")
+    if not auth_header.lower().startswith("bearer "):
+        return False
+    try:
+        payload = auth.jwt.decode(auth_header[7:], auth.SECRET_KEY, algorithms=[auth.ALGORITHM])
+    except auth.JWTError:
+        return False
+    return payload.get("role") == "admin"
+
+def _should_profile(request) -> bool:
+    if request.headers.get(PROFILE_HEADER) and _is_admin(request):
+        return True
+    return PROFILE_SAMPLE_RATE > 0 and random.random() < PROFILE_SAMPLE_RATE
+
+class RequestProfilingMiddleware(BaseHTTPMiddleware):
+    """
+    Cuenta las sentencias SQL de cada request para detectar N+1 y, si el
+    request lo pide (header de admin) o cae en el muestreo, guarda un perfil
+    estadístico en PROFILE_DIR y devuelve su id en `X-Profile-Id`.
+    """
+    async def dispatch(self, request, call_next):
+        queries = Counter()
+        token = _request_queries.set(queries)
+        threads_token = None
+        sampler = None
+        if _should_profile(request):
+            threads = {}
+            threads_token = _request_threads.set(threads)
+            sampler = _StackSampler(PROFILE_INTERVAL_MS / 1000.0, threads)
+            sampler.start()
+        started = time.perf_counter()
+        try:
+            response = await call_next(request)
+        finally:
+            duration_ms = (time.perf_counter() - started) * 1000
+            if sampler:
+                # join() bloquea: fuera del event loop
+                await anyio.to_thread.run_sync(sampler.stop)
+                _request_threads.reset(threads_token)
+            _request_queries.reset(token)
+
+        route = f"{request.method} {request.url.path}"
+        for statement, count in queries.items():
+            if count >= N_PLUS_ONE_THRESHOLD:
+                sql_logger.warning("Posible N+1 en %s: sentencia repetida %d veces: %s", route, count, statement)
+
+        if sampler:
+            profile_id = uuid.uuid4().hex
+            await anyio.to_thread.run_sync(_store_profile, profile_id, {
+                "route": route,
+                "status_code": response.status_code,
+                "duration_ms": round(duration_ms, 2),
+                "interval_ms": PROFILE_INTERVAL_MS,
+                "samples": sampler.samples,
+                "query_count": sum(queries.values()),
+                "queries": dict(queries.most_common()),
+                "stacks": dict(sampler.stacks.most_common()),
+            })
+            response.headers["X-Profile-Id"] = profile_id
+        return response
+
+def _store_profile(profile_id: str, profile: dict):
+    os.makedirs(PROFILE_DIR, exist_ok=True)
+    path = os.path.join(PROFILE_DIR, f"{profile_id}.json")
+    with open(path, "w") as f:
+        json.dump(profile, f)
+    logger.info("Perfil guardado para %s en %s", profile["route"], path)
+
+def load_profile(profile_id: str):
+    path = os.path.join(PROFILE_DIR, f"{os.path.basename(profile_id)}.json")
+    if not os.path.exists(path):
+        return None
+    with open(path) as f:
+        return json.load(f)
+
+# --- Hooks de SQLAlchemy ---
+
+def _bind_shape(parameters):
+    """Tipos de los parámetros, nunca sus valores (pueden ser datos personales)."""
+    if isinstance(parameters, dict):
+        return {k: type(v).__name__ for k, v in parameters.items()}
+    if isinstance(parameters, (list, tuple)):
+        if parameters and isinstance(parameters[0], (dict, list, tuple)):
+            return f"{len(parameters)} x {_bind_shape(parameters[0])}"
+        return [type(v).__name__ for v in parameters]
+    return type(parameters).__name__
+
+def install_query_hooks(engine):
+    """Registra timing de sentencias, log de queries lentas y conteo para N+1."""
+    @event.listens_for(engine, "before_cursor_execute")
+    def _before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+        conn.info.setdefault("query_start", []).append(time.perf_counter())
+
+    @event.listens_for(engine, "after_cursor_execute")
+    def _after_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+        elapsed_ms = (time.perf_counter() - conn.info["query_start"].pop()) * 1000
+        queries = _request_queries.get()
+        if queries is not None:
+            queries[statement] += 1
+        if elapsed_ms >= SLOW_QUERY_MS:
+            sql_logger.warning(
+                "Query lenta (%.1f ms): %s | binds: %s",
+                elapsed_ms, statement, _bind_shape(parameters)
+            )
+
+    @event.listens_for(engine, "handle_error")
+    def _handle_error(exception_context):
+        conn = exception_context.connection
+        if conn is not None and conn.info.get("query_start"):
+            conn.info["query_start"].pop()
@@ -0,0 +1,74 @@
+"""
+Planificador en proceso para los jobs periódicos de tasks.py.
+
+Cada worker de la API corre su propio hilo; los jobs registrados aquí deben
+ser idempotentes y coordinarse en la base (p.ej. el advisory lock de
+audit.py), porque con varios workers se ejecutan una vez por proceso.
+"""
+import logging
+import os
+import threading
+import time
+from typing import Callable, List, Optional
+import tasks
+
+logger = logging.getLogger("trustflow.scheduler")
+
+SCHEDULER_ENABLED = os.getenv("SCHEDULER_ENABLED", "true").lower() in ("1", "true", "yes")
+SCHEDULER_TICK_SECONDS = float(os.getenv("SCHEDULER_TICK_SECONDS", "30"))
+# Crear las particiones de auditoría por adelantado y aplicar la retención
+AUDIT_MAINTENANCE_INTERVAL_SECONDS = float(os.getenv("AUDIT_MAINTENANCE_INTERVAL_SECONDS", "3600"))
+
+class PeriodicJob:
+    def __init__(self, name: str, interval_seconds: float, fn: Callable[[], object], next_run: float):
+        self.name = name
+        self.interval_seconds = interval_seconds
+        self.fn = fn
+        self.next_run = next_run
+
+class Scheduler:
+    """Ejecuta cada job cada `interval_seconds` en un hilo daemon; un job que falla no detiene al resto."""
+    def __init__(self, tick_seconds: float = SCHEDULER_TICK_SECONDS):
+        self.tick_seconds = tick_seconds
+        self.jobs: List[PeriodicJob] = []
+        self._stop = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+
+    def every(self, interval_seconds: float, fn: Callable[[], object], name: Optional[str] = None):
+        # La primera ejecución es tras un intervalo: el arranque ya corre lo mismo (p.ej. ensure_partitions)
+        self.jobs.append(PeriodicJob(name or fn.__name__, interval_seconds, fn, time.monotonic() + interval_seconds))
+
+    def run_pending(self, now: Optional[float] = None) -> List[str]:
+        """Corre los jobs vencidos y devuelve sus nombres."""
+        now = time.monotonic() if now is None else now
+        ran = []
+        for job in self.jobs:
+            if job.next_run > now:
+                continue
+            job.next_run = now + job.interval_seconds
+            try:
+                job.fn()
+            except Exception:
+                logger.exception("Job programado %s falló", job.name)
+            ran.append(job.name)
+        return ran
+
+    def _loop(self):
+        while not self._stop.wait(self.tick_seconds):
+            self.run_pending()
+
+    def start(self):
+        if self._thread is not None and self._thread.is_alive():
+            return
+        self._stop.clear()
+        self._thread = threading.Thread(target=self._loop, name="trustflow-scheduler", daemon=True)
+        self._thread.start()
+
+    def stop(self):
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join()
+            self._thread = None
+
+scheduler = Scheduler()
+scheduler.every(AUDIT_MAINTENANCE_INTERVAL_SECONDS, tasks.maintain_audit_partitions)
@@ -1,6 +1,6 @@
 from pydantic import BaseModel, EmailStr
-from datetime import datetime
-from typing import Optional, List
+from datetime import datetime, date
+from typing import Optional, List, Dict
 
 class UserCreate(BaseModel):
     email: EmailStr
@@ -25,6 +25,14 @@ class UserOut(BaseModel):
     class Config:
         from_attributes = True
 
+class CarrierOut(BaseModel):
+    id: int
+    email: EmailStr
+    kyc_status: str
+    reputation_score: float
+    tier: str
+    active_orders: int
+
 class ProductCreate(BaseModel):
     title: str
     description: str
@@ -74,6 +82,32 @@ class OrderOut(BaseModel):
     class Config:
         from_attributes = True
 
+class BulkConfirmRequest(BaseModel):
+    order_ids: List[int]
+
+class BulkConfirmResult(BaseModel):
+    order_id: int
+    result: str # confirmed, not_found, forbidden, not_eligible
+
+class SellerDailyStatsOut(BaseModel):
+    day: date
+    order_count: int
+    gross_revenue: float
+    platform_fees: float
+    net_revenue: float
+
+    class Config:
+        from_attributes = True
+
+class SellerStatsOut(BaseModel):
+    seller_id: int
+    order_count: int
+    gross_revenue: float
+    platform_fees: float
+    net_revenue: float
+    orders_by_status: Dict[str, int]
+    daily: List[SellerDailyStatsOut]
+
 class ReviewCreate(BaseModel):
     order_id: int
     rating: int # 1-5
@@ -88,6 +122,13 @@ class ReviewOut(BaseModel):
     class Config:
         from_attributes = True
 
+class AuditLogOut(BaseModel):
+    id: int
+    user_id: Optional[int]
+    action: str
+    ip_address: Optional[str]
+    timestamp: datetime
+
 class Token(BaseModel):
     access_token: str
     token_type: str
@@ -0,0 +1,107 @@
+from collections import Counter
+from datetime import datetime, timedelta
+from typing import Any, Dict, List
+from sqlalchemy import update
+from sqlalchemy.orm import Session
+import models
+import stats
+import audit
+import carriers
+
+# Límite de órdenes por llamada al endpoint de liquidación en bloque
+MAX_BULK_ORDERS = 500
+
+def _audit_rows(user_id, action: str, order_ids, ip_address: str, now: datetime) -> List[Dict[str, Any]]:
+    # Misma acción que la ruta individual: una fila por orden, sin sufijo de id
+    return [
+        {"user_id": user_id, "action": action, "ip_address": ip_address, "timestamp": now}
+        for _ in order_ids
+    ]
+
+def bulk_confirm_delivery(db: Session, user: models.User, order_ids: List[int], ip_address: str) -> List[Dict[str, Any]]:
+    """
+    Confirma la entrega de varias órdenes y libera el escrow al vendedor:
+    una consulta para autorizar, un UPDATE set-based y un INSERT en bloque
+    de auditoría, todo en una transacción. Devuelve un resultado por orden.
+    """
+    order_ids = list(dict.fromkeys(order_ids))
+    rows = db.query(
+        models.Order.id, models.Order.buyer_id, models.Order.carrier_id,
+        models.Order.seller_id, models.Order.order_status, models.Order.escrow_status
+    ).filter(models.Order.id.in_(order_ids)).all()
+    by_id = {row.id: row for row in rows}
+
+    results = {}
+    authorized = []
+    for order_id in order_ids:
+        row = by_id.get(order_id)
+        if row is None:
+            results[order_id] = "not_found"
+        elif user.id != row.buyer_id and user.id != row.carrier_id:
+            results[order_id] = "forbidden"
+        elif row.escrow_status != "held":
+            results[order_id] = "not_eligible"
+        else:
+            authorized.append(order_id)
+
+    confirmed = []
+    if authorized:
+        now = datetime.utcnow()
+        # El filtro por escrow "held" evita liberar dos veces si hubo una escritura concurrente
+        confirmed = db.execute(
+            update(models.Order)
+            .where(models.Order.id.in_(authorized), models.Order.escrow_status == "held")
+            .values(order_status="delivered", escrow_status="released_to_seller", completed_at=now)
+            .returning(models.Order.id)
+        ).scalars().all()
+
+        stats.record_status_changes(db, Counter(
+            (by_id[order_id].seller_id, by_id[order_id].order_status, "delivered") for order_id in confirmed
+        ))
+        if confirmed:
+            audit.write_audit(db, _audit_rows(user.id, "ORDER_CONFIRM_DELIVERY", confirmed, ip_address, now))
+        db.commit()
+        for order_id in confirmed:
+            carriers.carrier_index.record_order(order_id, by_id[order_id].carrier_id, "delivered")
+
+    confirmed = set(confirmed)
+    for order_id in authorized:
+        results[order_id] = "confirmed" if order_id in confirmed else "not_eligible"
+
+    return [{"order_id": order_id, "result": results[order_id]} for order_id in order_ids]
+
+def auto_complete_delivered_orders(db: Session, days: int, batch_size: int = 1000) -> int:
+    """
+    Cierra como `completed` las órdenes entregadas hace más de `days` días
+    (fin de la ventana de disputa) y asegura el escrow liberado al vendedor.
+    Procesa en lotes para no mantener locks largos. Devuelve cuántas cerró.
+    """
+    cutoff = datetime.utcnow() - timedelta(days=days)
+    total = 0
+    while True:
+        rows = db.query(models.Order.id, models.Order.seller_id).filter(
+            models.Order.order_status == "delivered",
+            models.Order.completed_at < cutoff
+        ).limit(batch_size).all()
+        if not rows:
+            break
+
+        now = datetime.utcnow()
+        seller_by_id = {row.id: row.seller_id for row in rows}
+        completed = db.execute(
+            update(models.Order)
+            .where(models.Order.id.in_(list(seller_by_id)), models.Order.order_status == "delivered")
+            .values(order_status="completed", escrow_status="released_to_seller")
+            .returning(models.Order.id)
+        ).scalars().all()
+
+        stats.record_status_changes(db, Counter(
+            (seller_by_id[order_id], "delivered", "completed") for order_id in completed
+        ))
+        if completed:
+            audit.write_audit(db, _audit_rows(None, "ORDER_AUTO_COMPLETE", completed, "scheduler", now))
+        db.commit()
+        total += len(completed)
+        if len(rows) < batch_size:
+            break
+    return total
@@ -0,0 +1,185 @@
+import math
+from datetime import date, datetime, timedelta
+from typing import Any, Dict, List, Optional
+from sqlalchemy import func, literal, select
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.orm import Session
+import models
+
+# Tolerancias para comparar sumas de floats durante la reconciliación:
+# relativa para montos grandes, absoluta para valores cercanos a cero
+DRIFT_REL_TOLERANCE = 1e-9
+DRIFT_ABS_TOLERANCE = 1e-6
+
+AMOUNT_FIELDS = ("gross_revenue", "platform_fees", "net_revenue")
+
+def _bump(db: Session, model, keys: Dict[str, Any], deltas: Dict[str, float]):
+    """
+    Incrementa contadores con un UPDATE atómico (col = col + delta).
+    Si la fila no existe la inserta dentro de un savepoint; si otra transacción
+    la insertó primero, reintenta el UPDATE.
+    """
+    values = {getattr(model, k): getattr(model, k) + v for k, v in deltas.items()}
+    if "updated_at" in model.__table__.c:
+        values[model.updated_at] = datetime.utcnow()
+
+    updated = db.query(model).filter_by(**keys).update(values, synchronize_session=False)
+    if updated:
+        return
+    try:
+        with db.begin_nested():
+            db.add(model(**keys, **deltas))
+    except IntegrityError:
+        db.query(model).filter_by(**keys).update(values, synchronize_session=False)
+
+def _amount_deltas(order: models.Order, sign: int = 1) -> Dict[str, float]:
+    return {
+        "gross_revenue": sign * (order.total_amount or 0.0),
+        "platform_fees": sign * (order.platform_fee or 0.0),
+        "net_revenue": sign * (order.net_amount or 0.0),
+    }
+
+def record_order_created(db: Session, order: models.Order):
+    """Suma una orden nueva a los agregados. No hace commit: va en la transacción del caller."""
+    day = (order.created_at or datetime.utcnow()).date()
+    amounts = _amount_deltas(order)
+    _bump(db, models.SellerStats, {"seller_id": order.seller_id}, {"order_count": 1, **amounts})
+    _bump(db, models.SellerDailyStats, {"seller_id": order.seller_id, "day": day}, {"order_count": 1, **amounts})
+    _bump(db, models.SellerStatusCount, {"seller_id": order.seller_id, "order_status": order.order_status}, {"order_count": 1})
+
+def record_status_change(db: Session, seller_id: int, old_status: str, new_status: str):
+    """Mueve una orden de un bucket de estado a otro. No hace commit."""
+    if old_status == new_status:
+        return
+    _bump(db, models.SellerStatusCount, {"seller_id": seller_id, "order_status": old_status}, {"order_count": -1})
+    _bump(db, models.SellerStatusCount, {"seller_id": seller_id, "order_status": new_status}, {"order_count": 1})
+
+def record_status_changes(db: Session, changes: Dict[tuple, int]):
+    """
+    Versión en bloque de record_status_change: `changes` mapea
+    (seller_id, old_status, new_status) -> número de órdenes movidas.
+    """
+    deltas: Dict[tuple, int] = {}
+    for (seller_id, old_status, new_status), count in changes.items():
+        if old_status == new_status or not count:
+            continue
+        deltas[(seller_id, old_status)] = deltas.get((seller_id, old_status), 0) - count
+        deltas[(seller_id, new_status)] = deltas.get((seller_id, new_status), 0) + count
+    for (seller_id, order_status), delta in deltas.items():
+        if delta:
+            _bump(db, models.SellerStatusCount, {"seller_id": seller_id, "order_status": order_status}, {"order_count": delta})
+
+def get_seller_stats(db: Session, seller_id: int, days: int = 30) -> Dict[str, Any]:
+    """Lee los agregados directamente, sin escanear `orders`."""
+    totals = db.query(models.SellerStats).filter(models.SellerStats.seller_id == seller_id).first()
+    status_rows = db.query(models.SellerStatusCount).filter(
+        models.SellerStatusCount.seller_id == seller_id,
+        models.SellerStatusCount.order_count != 0
+    ).all()
+    since = datetime.utcnow().date() - timedelta(days=days - 1)
+    daily_rows = db.query(models.SellerDailyStats).filter(
+        models.SellerDailyStats.seller_id == seller_id,
+        models.SellerDailyStats.day >= since
+    ).order_by(models.SellerDailyStats.day).all()
+
+    return {
+        "seller_id": seller_id,
+        "order_count": totals.order_count if totals else 0,
+        "gross_revenue": totals.gross_revenue if totals else 0.0,
+        "platform_fees": totals.platform_fees if totals else 0.0,
+        "net_revenue": totals.net_revenue if totals else 0.0,
+        "orders_by_status": {r.order_status: r.order_count for r in status_rows},
+        "daily": daily_rows,
+    }
+
+# --- Reconciliación ---
+
+def _as_date(value) -> date:
+    # SQLite devuelve func.date() como texto, Postgres como date
+    if isinstance(value, date):
+        return value
+    return date.fromisoformat(str(value)[:10])
+
+def _differs(stored: Dict[str, Any], computed: Dict[str, Any], fields) -> bool:
+    for field in fields:
+        a = stored.get(field) or 0
+        b = computed.get(field) or 0
+        if not math.isclose(a, b, rel_tol=DRIFT_REL_TOLERANCE, abs_tol=DRIFT_ABS_TOLERANCE):
+            return True
+    return False
+
+def _snapshot(db: Session, model, key_names, fields, computed_query):
+    """
+    Lee agregados guardados y recalculados en UNA sola sentencia
+    (UNION ALL + GROUP BY), así ambos lados salen del mismo snapshot aunque
+    haya órdenes confirmándose en paralelo.
+    """
+    zero = {f: literal(0) for f in fields}
+    stored = select(
+        *[getattr(model, k).label(k) for k in key_names],
+        *[getattr(model, f).label(f"stored_{f}") for f in fields],
+        *[zero[f].label(f"computed_{f}") for f in fields],
+    )
+    computed = computed_query.subquery()
+    computed = select(
+        *[computed.c[k].label(k) for k in key_names],
+        *[zero[f].label(f"stored_{f}") for f in fields],
+        *[computed.c[f].label(f"computed_{f}") for f in fields],
+    )
+    both = stored.union_all(computed).subquery()
+    rows = db.execute(
+        select(
+            *[both.c[k] for k in key_names],
+            *[func.sum(both.c[f"stored_{f}"]).label(f"stored_{f}") for f in fields],
+            *[func.sum(both.c[f"computed_{f}"]).label(f"computed_{f}") for f in fields],
+        ).group_by(*[both.c[k] for k in key_names])
+    ).mappings().all()
+    return [
+        (
+            {k: row[k] for k in key_names},
+            {f: row[f"stored_{f}"] or 0 for f in fields},
+            {f: row[f"computed_{f}"] or 0 for f in fields},
+        )
+        for row in rows
+    ]
+
+def reconcile_seller_stats(db: Session, repair: bool = True) -> List[Dict[str, Any]]:
+    """
+    Recalcula los agregados desde `orders` y devuelve las diferencias con lo
+    guardado. Con `repair=True` corrige solo las claves con drift aplicando
+    la diferencia como incremento atómico (col = col + delta), de modo que
+    las órdenes que se confirmen mientras corre el job no se pierden.
+    """
+    Order = models.Order
+    value_fields = ("order_count",) + AMOUNT_FIELDS
+    sums = (
+        func.count(Order.id).label("order_count"),
+        func.coalesce(func.sum(Order.total_amount), 0.0).label("gross_revenue"),
+        func.coalesce(func.sum(Order.platform_fee), 0.0).label("platform_fees"),
+        func.coalesce(func.sum(Order.net_amount), 0.0).label("net_revenue"),
+    )
+    day_col = func.date(Order.created_at)
+    checks = [
+        (models.SellerStats, ("seller_id",), value_fields,
+         select(Order.seller_id.label("seller_id"), *sums).group_by(Order.seller_id)),
+        (models.SellerDailyStats, ("seller_id", "day"), value_fields,
+         select(Order.seller_id.label("seller_id"), day_col.label("day"), *sums).group_by(Order.seller_id, day_col)),
+        (models.SellerStatusCount, ("seller_id", "order_status"), ("order_count",),
+         select(Order.seller_id.label("seller_id"), Order.order_status.label("order_status"),
+                func.count(Order.id).label("order_count")).group_by(Order.seller_id, Order.order_status)),
+    ]
+
+    drift = []
+    for model, key_names, fields, computed_query in checks:
+        for keys, stored, computed in _snapshot(db, model, key_names, fields, computed_query):
+            if not _differs(stored, computed, fields):
+                continue
+            if "day" in keys:
+                keys["day"] = _as_date(keys["day"])
+            drift.append({"table": model.__tablename__, "key": keys, "stored": stored, "computed": computed})
+            if repair:
+                _bump(db, model, keys, {f: computed[f] - stored[f] for f in fields})
+
+    if repair and drift:
+        db.commit()
+    return drift
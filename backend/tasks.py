@@ -3,3 +3,41 @@ def process_order_fraud_check(order_id: int):
     print(f"Processing fraud check for order {order_id}...")
     # Logic to call AI service and update order status
     return True
+
+def reconcile_seller_stats(repair: bool = True):
+    """Periodic job: rebuild seller aggregates from `orders` and report drift."""
+    from database import SessionLocal
+    import stats
+
+    db = SessionLocal()
+    try:
+        drift = stats.reconcile_seller_stats(db, repair=repair)
+    finally:
+        db.close()
+    for entry in drift:
+        print(f"Seller stats drift in {entry['table']} {entry['key']}: stored={entry['stored']} computed={entry['computed']}")
+    print(f"Seller stats reconciliation finished: {len(drift)} drifted rows{' repaired' if repair and drift else ''}")
+    return drift
+
+def auto_complete_delivered_orders(days: int = 7):
+    """Scheduled job: close orders delivered more than `days` days ago and release their escrow."""
+    from database import SessionLocal
+    import settlement
+
+    db = SessionLocal()
+    try:
+        completed = settlement.auto_complete_delivered_orders(db, days)
+    finally:
+        db.close()
+    print(f"Auto-completed {completed} orders delivered more than {days} days ago")
+    return completed
+
+def maintain_audit_partitions():
+    """Scheduled job: pre-create upcoming audit partitions and apply the retention policy."""
+    from database import engine
+    import audit
+
+    audit.ensure_partitions(engine)
+    dropped = audit.apply_retention(engine)
+    print(f"Audit partitions maintained, dropped {len(dropped)}: {', '.join(dropped) or '-'}")
+    return dropped
@@ -0,0 +1,87 @@
+import os
+import sys
+import tempfile
+
+# La configuración del backend se lee al importar: fijar la base antes de cualquier import
+_DB_DIR = tempfile.mkdtemp(prefix="trustflow-tests-")
+os.environ["DATABASE_URL"] = "sqlite:///" + os.path.join(_DB_DIR, "test.db")
+os.environ.pop("DATABASE_REPLICA_URLS", None)
+os.environ.pop("REDIS_URL", None)
+os.environ["SCHEDULER_ENABLED"] = "false"
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import pytest
+from fastapi.testclient import TestClient
+from sqlalchemy import inspect, text
+
+import auth
+import audit
+import carriers
+import database
+import main
+import models
+
+main.limiter.enabled = False
+
+@pytest.fixture(autouse=True)
+def clean_db():
+    """Esquema limpio por test (incluidas las tablas mensuales de auditoría)."""
+    with database.engine.begin() as conn:
+        for name in inspect(conn).get_table_names():
+            if name.startswith("audit_logs_"):
+                conn.execute(text(f"DROP TABLE {name}"))
+    audit._sqlite_ready.clear()
+    models.Base.metadata.drop_all(bind=database.engine)
+    models.Base.metadata.create_all(bind=database.engine)
+    audit.ensure_partitions(database.engine)
+    database._sticky_until.clear()
+    carriers.carrier_index._built_at = None
+    yield
+
+@pytest.fixture
+def db():
+    session = database.SessionLocal()
+    try:
+        yield session
+    finally:
+        session.close()
+
+@pytest.fixture
+def client():
+    return TestClient(main.app)
+
+@pytest.fixture
+def make_user(db):
+    def _make_user(email, role="buyer", **fields):
+        user = models.User(email=email, hashed_password="x", role=role, **fields)
+        db.add(user)
+        db.commit()
+        db.refresh(user)
+        return user
+    return _make_user
+
+def auth_headers(user):
+    return {"Authorization": "Bearer " + auth.create_access_token({"sub": user.email, "role": user.role})}
+
+@pytest.fixture
+def marketplace(db, make_user):
+    """Vendedor, comprador, transportista y un producto listo para comprar."""
+    seller = make_user("seller@test.dev", "seller")
+    buyer = make_user("buyer@test.dev", "buyer")
+    carrier = make_user("carrier@test.dev", "carrier")
+    product = models.Product(seller_id=seller.id, title="Cámara", description="Usada, en buen estado",
+                             price=100.0, category="General", trust_score=80)
+    db.add(product)
+    db.commit()
+    db.refresh(product)
+    return {"seller": seller, "buyer": buyer, "carrier": carrier, "product": product}
+
+@pytest.fixture
+def create_order(client, marketplace):
+    """Crea una orden del comprador al vendedor de `marketplace` vía API y devuelve su JSON."""
+    def _create_order():
+        response = client.post("/orders", headers=auth_headers(marketplace["buyer"]), json={
+            "product_id": marketplace["product"].id, "carrier_id": marketplace["carrier"].id})
+        assert response.status_code == 200
+        return response.json()
+    return _create_order
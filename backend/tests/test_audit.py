@@ -0,0 +1,78 @@
+import gzip
+import json
+from datetime import datetime
+from sqlalchemy import insert
+from conftest import auth_headers
+import audit
+import database
+import models
+
+def test_ids_stay_unique_across_monthly_tables(db, make_user):
+    user = make_user("audit@test.dev")
+    for month in (1, 2, 3):
+        audit.write_audit(db, [
+            {"user_id": user.id, "action": f"ACTION_{month}", "ip_address": "127.0.0.1",
+             "timestamp": datetime(2025, month, 10)}
+            for _ in range(2)
+        ])
+    db.commit()
+
+    logs = audit.get_user_audit_logs(db, user.id, limit=10)
+    assert len(logs) == 6
+    assert len({log["id"] for log in logs}) == 6
+
+def test_id_counter_continues_after_legacy_rows(db, make_user):
+    user = make_user("legacy@test.dev")
+    db.execute(insert(models.AuditLog.__table__), [
+        {"id": 41, "user_id": user.id, "action": "OLD", "ip_address": "-", "timestamp": datetime(2024, 1, 1)},
+    ])
+    db.commit()
+    # Contador nuevo: debe partir del mayor id ya usado en el padre
+    with database.engine.begin() as conn:
+        conn.execute(audit._sqlite_id_counter.delete())
+    audit._sqlite_ready.discard((str(database.engine.url), audit._sqlite_id_counter.name))
+
+    audit.write_audit(db, [{"user_id": user.id, "action": "NEW", "ip_address": "-"}])
+    db.commit()
+
+    ids = {log["action"]: log["id"] for log in audit.get_user_audit_logs(db, user.id)}
+    assert ids == {"NEW": 42, "OLD": 41}
+
+def test_retention_drops_old_partitions_and_prunes_legacy_rows(db, make_user, tmp_path):
+    user = make_user("retention@test.dev")
+    db.execute(insert(models.AuditLog.__table__), [
+        {"id": 1, "user_id": user.id, "action": "LEGACY_OLD", "ip_address": "-", "timestamp": datetime(2024, 3, 1)},
+        {"id": 2, "user_id": user.id, "action": "LEGACY_RECENT", "ip_address": "-", "timestamp": datetime(2025, 5, 1)},
+    ])
+    audit.write_audit(db, [
+        {"user_id": user.id, "action": "EXPIRED", "ip_address": "-", "timestamp": datetime(2024, 6, 15)},
+        {"user_id": user.id, "action": "KEPT", "ip_address": "-", "timestamp": datetime(2025, 6, 15)},
+    ])
+    db.commit()
+
+    pruned = audit.apply_retention(database.engine, retention_months=12, archive_dir=str(tmp_path),
+                                   now=datetime(2025, 7, 20))
+
+    assert pruned == ["audit_logs_2024_06", "audit_logs"]
+    actions = {log["action"] for log in audit.get_user_audit_logs(db, user.id)}
+    assert actions == {"KEPT", "LEGACY_RECENT"}
+    with gzip.open(tmp_path / "audit_logs_before_2024_07.jsonl.gz", "rt") as f:
+        assert [json.loads(line)["action"] for line in f] == ["LEGACY_OLD"]
+    assert (tmp_path / "audit_logs_2024_06.jsonl.gz").exists()
+
+def test_before_accepts_timezone_aware_timestamps(client, db, make_user):
+    user = make_user("tz@test.dev")
+    audit.write_audit(db, [
+        {"user_id": user.id, "action": "EARLY", "ip_address": "-", "timestamp": datetime(2025, 3, 1, 10, 0)},
+        {"user_id": user.id, "action": "LATE", "ip_address": "-", "timestamp": datetime(2025, 3, 1, 12, 0)},
+    ])
+    db.commit()
+
+    response = client.get(f"/users/{user.id}/audit-logs", headers=auth_headers(user),
+                          params={"before": "2025-03-01T13:00:00+02:00"})
+
+    assert response.status_code == 200
+    assert [log["action"] for log in response.json()] == ["EARLY"]
+    response = client.get(f"/users/{user.id}/audit-logs", headers=auth_headers(user),
+                          params={"before": "2030-01-01T00:00:00Z"})
+    assert [log["action"] for log in response.json()] == ["LATE", "EARLY"]
@@ -0,0 +1,30 @@
+from benchmarks import run
+
+def _load(p95_ms, errors=0, count=100):
+    return {"throughput_rps": 10.0, "total_requests": count, "errors": errors, "wall_seconds": 10.0, "endpoints": {
+        "GET /products": {"count": count, "errors": errors, "throughput_rps": 10.0, "mean_ms": p95_ms / 2,
+                          "p50_ms": p95_ms / 2, "p95_ms": p95_ms, "p99_ms": p95_ms}}}
+
+BASELINE = {"config": {"database": "sqlite", "concurrency": 8}, "load": _load(10.0), "micro": {}}
+
+def test_percentile_is_nearest_rank():
+    values = [float(v) for v in range(1, 11)]
+    assert run._percentile(values, 50) == 5.0
+    assert run._percentile(values, 95) == 10.0
+    assert run._percentile(values, 91) == 10.0
+    assert run._percentile([7.0], 99) == 7.0
+
+def test_error_rate_increase_is_a_regression():
+    regressions = run.compare({"load": _load(10.0, errors=5), "micro": {}}, BASELINE, 0.25, 1.0)
+    assert list(regressions) == ["GET /products errors"]
+
+def test_regression_must_repeat_in_every_run():
+    noisy = {"load_runs": [_load(30.0), _load(10.0), _load(30.0)], "micro": {}}
+    assert run.persistent_regressions(noisy, BASELINE, 0.25, 1.0, 0.01) == []
+
+    slower = {"load_runs": [_load(30.0), _load(25.0), _load(30.0)], "micro": {}}
+    assert "GET /products p95_ms: 10.00 -> 30.00 ms" in run.persistent_regressions(slower, BASELINE, 0.25, 1.0, 0.01)
+
+def test_config_mismatch_lists_differing_parameters():
+    results = {"config": {"database": "postgresql", "concurrency": 8}}
+    assert run.config_mismatch(results, BASELINE) == ["database: sqlite -> postgresql"]
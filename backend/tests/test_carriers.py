@@ -0,0 +1,95 @@
+import threading
+import time
+from sqlalchemy import insert
+from conftest import auth_headers
+import carriers
+import models
+
+def test_users_carriers_returns_every_carrier_by_id(client, db, marketplace):
+    db.execute(insert(models.User), [
+        {"email": f"carrier-{i}@test.dev", "hashed_password": "x", "role": "carrier"} for i in range(120)
+    ])
+    db.commit()
+
+    body = client.get("/users/carriers").json()
+
+    assert len(body) == 121
+    assert [c["id"] for c in body] == sorted(c["id"] for c in body)
+
+def test_available_carriers_track_active_orders(client, marketplace, create_order):
+    first = create_order()["id"]
+    create_order()
+    client.post(f"/orders/{first}/confirm", headers=auth_headers(marketplace["carrier"]))
+
+    body = client.get("/carriers/available").json()
+
+    assert body[0]["id"] == marketplace["carrier"].id
+    assert body[0]["active_orders"] == 1
+
+def test_expired_index_is_rebuilt_once(monkeypatch, marketplace):
+    index = carriers.carrier_index
+    rebuilds = []
+    original = index.rebuild
+
+    def slow_rebuild(db):
+        rebuilds.append(threading.get_ident())
+        time.sleep(0.05)
+        original(db)
+
+    monkeypatch.setattr(index, "rebuild", slow_rebuild)
+    threads = [threading.Thread(target=index.best_available) for _ in range(8)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    assert len(rebuilds) == 1
+
+def test_order_committed_after_expiry_is_counted_once(client, marketplace, create_order):
+    create_order()
+    index = carriers.carrier_index
+    assert index.best_available()[0]["active_orders"] == 1
+
+    # Vence el TTL: la orden siguiente ajusta el índice viejo y la reconstrucción
+    # posterior no debe sumarla otra vez
+    index._built_at = time.monotonic() - index.ttl_seconds - 1
+    create_order()
+
+    assert index.best_available()[0]["active_orders"] == 2
+
+class _ReadHook:
+    """Sesión que ejecuta `hook` justo antes de la consulta número `at` de la reconstrucción."""
+    def __init__(self, db, at, hook):
+        self.db, self.at, self.hook, self.calls = db, at, hook, 0
+
+    def query(self, *entities):
+        self.calls += 1
+        if self.calls == self.at:
+            self.hook()
+        return self.db.query(*entities)
+
+def test_orders_written_during_a_rebuild_are_counted_once(client, db, marketplace, monkeypatch, create_order):
+    index = carriers.carrier_index
+    index.best_available()
+    created = []
+    create = lambda: created.append(create_order()["id"])
+
+    # Antes de leer las órdenes: la lectura ya la ve y el replay no la suma otra vez
+    index.rebuild(_ReadHook(db, 2, create))
+    assert index.best_available()[0]["active_orders"] == 1
+
+    # Después de leer, antes de reemplazar: solo el replay la aporta
+    original = index._from_user
+    def from_user_then_create(user):
+        if len(created) == 1:
+            create()
+        return original(user)
+    monkeypatch.setattr(index, "_from_user", from_user_then_create)
+    index.rebuild(db)
+    monkeypatch.undo()
+    assert len(created) == 2
+    assert index.best_available()[0]["active_orders"] == 2
+
+    client.post(f"/orders/{created[0]}/confirm", headers=auth_headers(marketplace["carrier"]))
+    index.rebuild(_ReadHook(db, 2, lambda: None))
+    assert index.best_available()[0]["active_orders"] == 1
@@ -0,0 +1,48 @@
+import itertools
+import pytest
+from sqlalchemy import create_engine
+from sqlalchemy.orm import sessionmaker
+import database
+import models
+from conftest import auth_headers
+
+@pytest.fixture
+def lagging_replica(tmp_path, monkeypatch):
+    """Réplica SQLite con el esquema pero sin datos: simula lag de replicación infinito."""
+    engine = create_engine(f"sqlite:///{tmp_path / 'replica.db'}", connect_args={"check_same_thread": False})
+    models.Base.metadata.create_all(bind=engine)
+    monkeypatch.setattr(database, "_replica_cycle", itertools.cycle([sessionmaker(bind=engine)]))
+    yield engine
+    engine.dispose()
+
+def test_register_login_me_reads_own_writes(client, lagging_replica):
+    client.post("/register", json={"email": "new@test.dev", "password": "secret", "role": "buyer"})
+    token = client.post("/token", data={"username": "new@test.dev", "password": "secret"}).json()["access_token"]
+
+    response = client.get("/users/me", headers={"Authorization": f"Bearer {token}"})
+
+    assert response.status_code == 200
+    assert response.json()["email"] == "new@test.dev"
+
+def test_reads_go_to_replica_without_recent_writes(client, make_user, lagging_replica):
+    user = make_user("quiet@test.dev")
+    # El usuario existe en el primario pero no en la réplica
+    assert client.get("/users/me", headers=auth_headers(user)).status_code == 401
+
+def test_core_insert_marks_session_sticky(db):
+    import audit
+    database.bind_session_user(db, "audit@test.dev")
+    audit.write_audit(db, [{"user_id": None, "action": "TEST", "ip_address": "x"}])
+    db.commit()
+    assert database.is_primary_sticky(database.user_sticky_key("audit@test.dev"))
+
+def test_anonymous_listing_after_publishing_reads_own_writes(client, make_user, lagging_replica):
+    seller = make_user("seller@test.dev", "seller", reputation_score=80)
+    created = client.post("/products", headers=auth_headers(seller), json={
+        "title": "Cámara", "description": "Usada, en buen estado, con factura.", "price": 100.0})
+    assert created.status_code == 200
+
+    # products.list en api.ts no envía Authorization: la clave sticky es la IP del cliente
+    listing = client.get("/products")
+
+    assert [p["id"] for p in listing.json()] == [created.json()["id"]]
@@ -0,0 +1,95 @@
+import asyncio
+import threading
+import time
+from fastapi import Depends, FastAPI
+from fastapi.testclient import TestClient
+import auth
+import profiling
+
+def slow_work():
+    time.sleep(0.2)
+    return {"ok": True}
+
+def slow_dependency_work():
+    time.sleep(0.1)
+
+def noise_loop(stop):
+    while not stop.is_set():
+        time.sleep(0.001)
+
+def _profiled_app():
+    app = FastAPI()
+    app.router.route_class = profiling.ProfiledRoute
+    app.add_middleware(profiling.RequestProfilingMiddleware)
+
+    opened = []
+
+    def get_resource():
+        opened.append(1)
+        slow_dependency_work()
+        yield "resource"
+
+    def get_user(resource: str = Depends(get_resource)):
+        return resource
+
+    @app.get("/slow")
+    def slow():
+        return slow_work()
+
+    @app.get("/with-deps")
+    def with_deps(user: str = Depends(get_user), resource: str = Depends(get_resource)):
+        return {"opened": len(opened)}
+
+    @app.get("/async")
+    async def async_slow():
+        await asyncio.sleep(0.05)
+        return slow_work()
+    return app
+
+def _profile(app, path):
+    admin_token = auth.create_access_token({"sub": "admin@test.dev", "role": "admin"})
+    response = TestClient(app).get(path, headers={
+        "Authorization": f"Bearer {admin_token}", profiling.PROFILE_HEADER: "1"})
+    return response, profiling.load_profile(response.headers["X-Profile-Id"])
+
+def test_profile_only_samples_the_request_thread(tmp_path, monkeypatch):
+    monkeypatch.setattr(profiling, "PROFILE_DIR", str(tmp_path))
+    admin_token = auth.create_access_token({"sub": "admin@test.dev", "role": "admin"})
+    stop = threading.Event()
+    noise = threading.Thread(target=noise_loop, args=(stop,), daemon=True)
+    noise.start()
+    try:
+        response = TestClient(_profiled_app()).get("/slow", headers={
+            "Authorization": f"Bearer {admin_token}", profiling.PROFILE_HEADER: "1"})
+    finally:
+        stop.set()
+        noise.join()
+
+    profile = profiling.load_profile(response.headers["X-Profile-Id"])
+    assert profile["stacks"]
+    # Toda pila muestreada cuelga del wrapper de track_thread del endpoint
+    assert all("wrapper (profiling.py" in stack for stack in profile["stacks"])
+    assert any("slow_work" in stack for stack in profile["stacks"])
+    assert not any("noise_loop" in stack for stack in profile["stacks"])
+
+def test_profile_header_requires_admin(tmp_path, monkeypatch):
+    monkeypatch.setattr(profiling, "PROFILE_DIR", str(tmp_path))
+    buyer_token = auth.create_access_token({"sub": "buyer@test.dev", "role": "buyer"})
+    response = TestClient(_profiled_app()).get("/slow", headers={
+        "Authorization": f"Bearer {buyer_token}", profiling.PROFILE_HEADER: "1"})
+    assert "X-Profile-Id" not in response.headers
+
+def test_profile_covers_sync_dependencies(tmp_path, monkeypatch):
+    monkeypatch.setattr(profiling, "PROFILE_DIR", str(tmp_path))
+    response, profile = _profile(_profiled_app(), "/with-deps")
+
+    # La dependencia con yield sigue cacheada: una sola apertura por request
+    assert response.json() == {"opened": 1}
+    assert any("slow_dependency_work" in stack for stack in profile["stacks"])
+
+def test_profile_samples_async_endpoints_on_the_event_loop(tmp_path, monkeypatch):
+    monkeypatch.setattr(profiling, "PROFILE_DIR", str(tmp_path))
+    _, profile = _profile(_profiled_app(), "/async")
+
+    assert any("slow_work" in stack for stack in profile["stacks"])
+    assert all("async_slow" in stack for stack in profile["stacks"])
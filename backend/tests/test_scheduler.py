@@ -0,0 +1,18 @@
+import scheduler
+import tasks
+
+def test_jobs_run_when_due_and_failures_are_isolated():
+    calls = []
+    sched = scheduler.Scheduler()
+    sched.every(10, lambda: 1 / 0, name="broken")
+    sched.every(10, lambda: calls.append("ran"), name="healthy")
+    start = max(job.next_run for job in sched.jobs)
+
+    assert sched.run_pending(now=min(job.next_run for job in sched.jobs) - 1) == []
+    assert sched.run_pending(now=start) == ["broken", "healthy"]
+    assert sched.run_pending(now=start + 5) == []
+    assert sched.run_pending(now=start + 10) == ["broken", "healthy"]
+    assert calls == ["ran", "ran"]
+
+def test_audit_maintenance_is_scheduled():
+    assert tasks.maintain_audit_partitions in [job.fn for job in scheduler.scheduler.jobs]
@@ -0,0 +1,60 @@
+from datetime import datetime, timedelta
+from conftest import auth_headers
+import audit
+import models
+import settlement
+import stats
+
+def test_bulk_confirm_reports_a_result_per_order(client, db, make_user, marketplace, create_order):
+    held = create_order()["id"]
+    released = create_order()["id"]
+    client.post(f"/orders/{released}/confirm", headers=auth_headers(marketplace["buyer"]))
+    other_buyer = make_user("other@test.dev", "buyer")
+    foreign = db.get(models.Order, create_order()["id"])
+    foreign.buyer_id = other_buyer.id
+    foreign.carrier_id = other_buyer.id
+    db.commit()
+
+    response = client.post("/orders/bulk-confirm", headers=auth_headers(marketplace["carrier"]),
+                           json={"order_ids": [held, released, foreign.id, 9999, held]})
+
+    assert response.status_code == 200
+    assert response.json() == [
+        {"order_id": held, "result": "confirmed"},
+        {"order_id": released, "result": "not_eligible"},
+        {"order_id": foreign.id, "result": "forbidden"},
+        {"order_id": 9999, "result": "not_found"},
+    ]
+    order = db.get(models.Order, held)
+    db.refresh(order)
+    assert order.order_status == "delivered" and order.escrow_status == "released_to_seller"
+
+def test_bulk_confirm_audits_with_the_single_order_action(client, db, marketplace, create_order):
+    first = create_order()["id"]
+    second = create_order()["id"]
+    client.post(f"/orders/{first}/confirm", headers=auth_headers(marketplace["carrier"]))
+    client.post("/orders/bulk-confirm", headers=auth_headers(marketplace["carrier"]), json={"order_ids": [second]})
+
+    logs = audit.get_user_audit_logs(db, marketplace["carrier"].id, limit=10)
+    assert [log["action"] for log in logs] == ["ORDER_CONFIRM_DELIVERY", "ORDER_CONFIRM_DELIVERY"]
+
+def test_bulk_confirm_rejects_empty_and_oversized_batches(client, marketplace):
+    headers = auth_headers(marketplace["carrier"])
+    assert client.post("/orders/bulk-confirm", headers=headers, json={"order_ids": []}).status_code == 400
+    too_many = list(range(1, settlement.MAX_BULK_ORDERS + 2))
+    assert client.post("/orders/bulk-confirm", headers=headers, json={"order_ids": too_many}).status_code == 400
+
+def test_auto_complete_processes_every_batch(client, db, marketplace, create_order):
+    order_ids = [create_order()["id"] for _ in range(5)]
+    client.post("/orders/bulk-confirm", headers=auth_headers(marketplace["carrier"]), json={"order_ids": order_ids})
+    # Cuatro fuera de la ventana de disputa, una todavía dentro
+    db.query(models.Order).filter(models.Order.id.in_(order_ids[:4])).update(
+        {"completed_at": datetime.utcnow() - timedelta(days=10)}, synchronize_session=False)
+    db.commit()
+
+    assert settlement.auto_complete_delivered_orders(db, days=7, batch_size=3) == 4
+
+    statuses = dict(db.query(models.Order.id, models.Order.order_status).all())
+    assert [statuses[order_id] for order_id in order_ids] == ["completed"] * 4 + ["delivered"]
+    assert stats.reconcile_seller_stats(db, repair=False) == []
+    assert settlement.auto_complete_delivered_orders(db, days=7, batch_size=3) == 0
@@ -50,11 +50,64 @@ CREATE TABLE IF NOT EXISTS reviews (
     comment TEXT
 );
 
--- Audit Logs Table
+-- Audit Logs Table (particionada por mes; backend/audit.py crea las particiones futuras y aplica la retención)
 CREATE TABLE IF NOT EXISTS audit_logs (
-    id SERIAL PRIMARY KEY,
+    id INTEGER GENERATED BY DEFAULT AS IDENTITY,
     user_id INTEGER REFERENCES users(id),
     action VARCHAR(255),
     ip_address VARCHAR(50),
-    timestamp TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+    timestamp TIMESTAMP NOT NULL DEFAULT CURRENT_TIMESTAMP,
+    PRIMARY KEY (id, timestamp)
+) PARTITION BY RANGE (timestamp);
+
+CREATE INDEX IF NOT EXISTS ix_audit_logs_user_id_timestamp ON audit_logs (user_id, timestamp);
+
+-- Default y particiones del mes actual y los dos siguientes. Si audit_logs ya existía
+-- sin particionar (despliegue previo), no se toca: el backend la migra al arrancar
+-- (audit.migrate_legacy_table).
+DO $$
+DECLARE
+    month_start DATE;
+BEGIN
+    IF (SELECT relkind FROM pg_class WHERE oid = 'audit_logs'::regclass) <> 'p' THEN
+        RAISE NOTICE 'audit_logs no está particionada; la migración la hace el backend';
+        RETURN;
+    END IF;
+    CREATE TABLE IF NOT EXISTS audit_logs_default PARTITION OF audit_logs DEFAULT;
+    FOR i IN 0..2 LOOP
+        month_start := (date_trunc('month', CURRENT_DATE) + make_interval(months => i))::DATE;
+        EXECUTE format(
+            'CREATE TABLE IF NOT EXISTS %I PARTITION OF audit_logs FOR VALUES FROM (%L) TO (%L)',
+            'audit_logs_' || to_char(month_start, 'YYYY_MM'),
+            month_start,
+            (month_start + INTERVAL '1 month')::DATE
+        );
+    END LOOP;
+END $$;
+
+-- Seller Aggregates (mantenidos en la misma transacción que orders)
+CREATE TABLE IF NOT EXISTS seller_stats (
+    seller_id INTEGER PRIMARY KEY REFERENCES users(id),
+    order_count INTEGER DEFAULT 0,
+    gross_revenue FLOAT DEFAULT 0.0,
+    platform_fees FLOAT DEFAULT 0.0,
+    net_revenue FLOAT DEFAULT 0.0,
+    updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+);
+
+CREATE TABLE IF NOT EXISTS seller_status_counts (
+    seller_id INTEGER REFERENCES users(id),
+    order_status VARCHAR(50),
+    order_count INTEGER DEFAULT 0,
+    PRIMARY KEY (seller_id, order_status)
+);
+
+CREATE TABLE IF NOT EXISTS seller_daily_stats (
+    seller_id INTEGER REFERENCES users(id),
+    day DATE,
+    order_count INTEGER DEFAULT 0,
+    gross_revenue FLOAT DEFAULT 0.0,
+    platform_fees FLOAT DEFAULT 0.0,
+    net_revenue FLOAT DEFAULT 0.0,
+    PRIMARY KEY (seller_id, day)
 );
@@ -167,6 +167,23 @@ export const api = {
       );
     },
   },
+  sellers: {
+    stats: async (token, days: number = 30) => {
+      return fetchWithFallback(
+        `${API_URL}/sellers/me/stats?days=${days}`,
+        { headers: { Authorization: `Bearer ${token}` } },
+        {
+          seller_id: MOCK_USER.id,
+          order_count: 0,
+          gross_revenue: 0,
+          platform_fees: 0,
+          net_revenue: 0,
+          orders_by_status: {},
+          daily: []
+        }
+      );
+    },
+  },
   orders: {
     create: async (token, orderData) => {
       return fetchWithFallback(
@@ -197,6 +214,13 @@ export const api = {
         {},
         MOCK_CARRIERS
       );
+    },
+    getAvailableCarriers: async (limit: number = 10, skip: number = 0) => {
+      return fetchWithFallback(
+        `${API_URL}/carriers/available?limit=${limit}&skip=${skip}`,
+        {},
+        MOCK_CARRIERS.map(c => ({ ...c, tier: UserTier.BRONZE, active_orders: 0 }))
+      );
     }
   },
 };
\ No newline at end of file